@@ -1,119 +1,612 @@
 import chess
-import math
+import chess.polyglot
 from constants import PIECE_TABLES, PIECE_VALUES
+import atexit
 import logging
+import multiprocessing
+import os
 import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from transposition import EXACT, LOWER, TranspositionTable
 
 TOP_N_MOVES = 3
 
+# Integer search bounds, well beyond any mate score, so window arithmetic
+# stays in ints instead of mixing in float infinities
+INF = 10**9
+
+# Process-wide transposition table shared by every search (see transposition.py)
+TT_MAX_ENTRIES = 200_000
+_TT = TranspositionTable(TT_MAX_ENTRIES)
+
+# Quiet-move ordering state, shared process-wide like the TT: two killer
+# moves per ply (quiet moves that caused a beta cutoff there) and a history
+# score per (piece type, to-square) bumped on every quiet cutoff. Each new
+# search clears the killers and halves the history (_age_move_ordering), so
+# earlier games fade out instead of piling up.
+MAX_PLY = 64
+_KILLERS = [[None, None] for _ in range(MAX_PLY)]
+_HISTORY = {}
+
+# Half-width (centipawns) of the root aspiration window in iterative deepening.
+# Depth-1 root scores are bare quiescence and swing too far to centre a
+# window on, so aspiration starts once the previous iteration was a search.
+ASPIRATION_WINDOW = 50
+ASPIRATION_MIN_DEPTH = 3
+
+# Quiescence delta pruning margin (centipawns) on top of the captured piece
+DELTA_MARGIN = 200
+
+# Null-move pruning: the pass is searched NULL_MOVE_REDUCTION plies shallower
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+
+# Root splitting (opt-in, see choose_ai_move's ``workers``): from
+# ROOT_SPLIT_MIN_DEPTH the root moves are searched in parallel on a process
+# pool (the GIL rules out threads), capped at ROOT_SPLIT_MAX_WORKERS and the
+# CPU count. Each worker keeps its own TT, reset via the search generation
+# whenever clear_tt() runs. A pool that fails to start or breaks is not
+# retried; the search stays serial for the rest of the process.
+ROOT_SPLIT_MAX_WORKERS = 4
+ROOT_SPLIT_MIN_DEPTH = 3
+_ROOT_POOL = None
+_ROOT_POOL_DISABLED = False
+_ROOT_POOL_LOCK = threading.Lock()
+
+# Bumped by clear_tt(); pool workers clear their own state when it changes
+_SEARCH_GENERATION = 0
+
+# Polyglot zobrist terms for incremental key updates in negamax: per piece
+# index ((type - 1) * 2 + colour) a 64-square table, plus the side-to-move bit
+_ZOBRIST = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+_ZOBRIST_PIECES = [chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * i:64 * (i + 1)] for i in range(12)]
+_ZOBRIST_TURN = chess.polyglot.POLYGLOT_RANDOM_ARRAY[780]
+
+# Completed root searches by (zobrist key, depth, halfmove clock, repeated),
+# least recently used first. The last two keep positions whose draw status
+# (50-move rule, repetitions) differs from sharing a result. Like the TT the
+# cache is process-wide and outlives the request (every game and user shares
+# it); threaded requests go through _ROOT_CACHE_LOCK.
+ROOT_CACHE_MAX_ENTRIES = 1024
+_ROOT_CACHE = OrderedDict()
+_ROOT_CACHE_LOCK = threading.Lock()
+
+
+def clear_tt():
+    """
+    Forget every cached search result (e.g. for test isolation). Root-split
+    workers follow on the next task they run for this process.
+    """
+    global _SEARCH_GENERATION
+    _SEARCH_GENERATION += 1
+    _TT.clear()
+    with _ROOT_CACHE_LOCK:
+        _ROOT_CACHE.clear()
+    for killers in _KILLERS:
+        killers[0] = killers[1] = None
+    _HISTORY.clear()
+
 
 logger = logging.getLogger(__name__)
 
+
+class SearchTimeout(Exception):
+    """Raised inside the search once the iterative-deepening deadline passes."""
+
+# PIECE_VALUES as a tuple indexed by piece type (PAWN=1 .. KING=6), so hot
+# loops index instead of hashing into the dict
+_PIECE_VALUES = (0,) + tuple(PIECE_VALUES[piece_type] for piece_type in chess.PIECE_TYPES)
+
+# Value + piece-square bonus per (piece type, square), flattened per color so
+# the evaluation loop is a single list index per piece. Black reads the
+# white-perspective tables through square_mirror, baked in here once. Both
+# are in PIECE_TYPES order to zip against the piece bitboards.
+_WHITE_PST = tuple(
+    [_PIECE_VALUES[piece_type] + PIECE_TABLES[piece_type][sq] for sq in chess.SQUARES]
+    for piece_type in chess.PIECE_TYPES
+)
+_BLACK_PST = tuple(
+    [_PIECE_VALUES[piece_type] + PIECE_TABLES[piece_type][chess.square_mirror(sq)] for sq in chess.SQUARES]
+    for piece_type in chess.PIECE_TYPES
+)
+
+
 def evaluate_board(board):
-    if board.is_checkmate():
-        return -99999 if board.turn else 99999
-    if board.is_stalemate() or board.is_insufficient_material():
+    # One legal-move probe covers both checkmate and stalemate
+    if not any(board.generate_legal_moves()):
+        if board.is_check():
+            return -99999 if board.turn else 99999
+        return 0
+    if board.is_insufficient_material():
         return 0
 
     score = 0
-    
-    # Material and positional evaluation
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            value = PIECE_VALUES[piece.piece_type]
-            table = PIECE_TABLES[piece.piece_type]
-            
-            if piece.color == chess.WHITE:
-                score += value + table[square]
-            else:
-                score -= value + table[chess.square_mirror(square)]
-    
-    return score 
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
+
+    # Material and positional evaluation, walking only occupied squares
+    bitboards = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+    for bb, white_pst, black_pst in zip(bitboards, _WHITE_PST, _BLACK_PST):
+        for square in chess.scan_forward(bb & white):
+            score += white_pst[square]
+        for square in chess.scan_forward(bb & black):
+            score -= black_pst[square]
+
+    return score
 
 
 def quiescence(board, alpha, beta, depth=0, max_depth=4):
-    """Quiescence search to handle captures and checks"""
+    """Quiescence search to handle captures and checks (white's perspective)"""
+    alpha, beta = max(alpha, -INF), min(beta, INF)
+    if board.turn == chess.WHITE:
+        return _quiesce(board, alpha, beta, depth, max_depth)
+    return -_quiesce(board, -beta, -alpha, depth, max_depth)
+
+
+def _quiesce(board, alpha, beta, depth=0, max_depth=4):
+    """Quiescence search scored from the side to move's perspective."""
     stand_pat = evaluate_board(board)
-    
+    if board.turn == chess.BLACK:
+        stand_pat = -stand_pat
+
     if stand_pat >= beta:
         return beta
     if alpha < stand_pat:
         alpha = stand_pat
-    
+
     # Limit quiescence depth to prevent infinite recursion
     if depth >= max_depth:
         return alpha
-    
-    # Only consider captures and check evasions
+
+    # Only consider captures and check evasions; captures go first in
+    # MVV-LVA order so the likeliest cutoffs are searched before checks
+    captures = []
+    checks = []
+    enemy = board.occupied_co[not board.turn]
+    ep_square = board.ep_square if board.pawns & board.occupied_co[board.turn] else None
+    bb_squares = chess.BB_SQUARES
+    # Delta pruning: skip captures that could not reach alpha even if the
+    # victim came for free plus a margin. Not in check, where every
+    # evasion has to be looked at.
+    delta_floor = alpha - stand_pat - DELTA_MARGIN if not board.is_check() else -INF
     for move in board.legal_moves:
-        if board.is_capture(move) or board.gives_check(move):
-            board.push(move)
-            score = quiescence(board, alpha, beta, depth + 1, max_depth)
-            board.pop()
-            
-            if score >= beta:
-                return beta
-            if score > alpha:
-                alpha = score
-    
+        if enemy & bb_squares[move.to_square] or (
+            move.to_square == ep_square and board.pawns & bb_squares[move.from_square]
+        ):
+            victim = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+            if _PIECE_VALUES[victim] < delta_floor and move.promotion is None:
+                continue
+            captures.append((mvv_lva(board, move), move))
+        elif board.gives_check(move):
+            checks.append(move)
+    captures.sort(key=lambda x: x[0], reverse=True)
+
+    for move in [move for _, move in captures] + checks:
+        board.push(move)
+        score = -_quiesce(board, -beta, -alpha, depth + 1, max_depth)
+        board.pop()
+
+        if score >= beta:
+            return beta
+        if score > alpha:
+            alpha = score
+
     return alpha
 
 
-def minimax(board, depth, alpha, beta, maximizing_white):
-    """Minimax from white's perspective (maximizing_white=True means white's turn)"""
+def negamax(board, depth, alpha, beta, deadline=None, ply=0, key=None):
+    """
+    Principal variation search, scored from the side to move's perspective.
+    Raises SearchTimeout once time.monotonic() passes ``deadline``.
+    ``ply`` is the distance from the root, used to index the killer table.
+    ``key`` is the position's zobrist hash when the caller already has it.
+    """
     if depth == 0:
-        return quiescence(board, alpha, beta)
-    
-    if board.is_game_over():
-        return evaluate_board(board)
+        return _quiesce(board, alpha, beta)
+
+    if deadline is not None and time.monotonic() >= deadline:
+        raise SearchTimeout
+
+    # Draws by rule are O(1) apart from the repetition scan, which needs at
+    # least eight reversible plies. Checkmate and stalemate are left to the
+    # move loop below, which generates the legal moves anyway.
+    if (
+        board.is_insufficient_material()
+        or board.is_seventyfive_moves()
+        or (board.halfmove_clock >= 8 and board.is_fivefold_repetition())
+    ):
+        return 0
+
+    # Probe the transposition table; a deep enough entry either answers
+    # the node outright or narrows the window.
+    if key is None:
+        key = chess.polyglot.zobrist_hash(board)
+    entry = _TT.get(key)
+    tt_move = entry[3] if entry is not None else None
+    if entry is not None and entry[0] >= depth:
+        _, value, flag, _ = entry
+        if flag == EXACT:
+            return value
+        if flag == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+
+    # Null-move pruning: if passing still fails high for the side to move, a
+    # real move will too. Skipped in check, right after another null move,
+    # and when the side to move has only pawns left (zugzwang risk).
+    if (
+        depth >= NULL_MOVE_MIN_DEPTH
+        and not board.is_check()
+        and (not board.move_stack or board.move_stack[-1])
+        and _has_non_pawn_material(board)
+    ):
+        null_depth = depth - 1 - NULL_MOVE_REDUCTION
+        null_key = _push_keyed(board, chess.Move.null(), key if null_depth > 0 else None)
+        null_score = -negamax(board, null_depth, -beta, -beta + 1, deadline, ply + 1, null_key)
+        board.pop()
+        if null_score >= beta:
+            return beta
+
+    alpha_orig, beta_orig = alpha, beta
+    best_score = -INF
+    best_move = None
+
+    # Children at depth 0 drop into quiescence, which never hashes
+    parent_key = key if depth > 1 else None
+    for i, move in enumerate(_search_order(board, tt_move, ply)):
+        child_key = _push_keyed(board, move, parent_key)
+        if i == 0:
+            score = -negamax(board, depth - 1, -beta, -alpha, deadline, ply + 1, child_key)
+        else:
+            # Prove the move is no better than alpha with a null window,
+            # re-searching with the full window only when that fails high
+            score = -negamax(board, depth - 1, -alpha - 1, -alpha, deadline, ply + 1, child_key)
+            if alpha < score < beta:
+                score = -negamax(board, depth - 1, -beta, -alpha, deadline, ply + 1, child_key)
+        board.pop()
+        if best_move is None or score > best_score:
+            best_score, best_move = score, move
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            _record_cutoff(board, move, depth, ply)
+            break
+
+    if best_move is None:
+        # No legal moves: checkmate or stalemate
+        return -99999 if board.is_check() else 0
+
+    _TT.store(key, depth, best_score, alpha_orig, beta_orig, best_move)
+    return best_score
+
+
+def minimax(board, depth, alpha, beta, maximizing_white, deadline=None, ply=0):
+    """
+    Search score from white's perspective, with the window in white's terms.
+    A thin wrapper over negamax; the side to move is taken from the board,
+    ``maximizing_white`` is kept for callers that still pass it.
+    """
+    alpha, beta = max(alpha, -INF), min(beta, INF)
+    if board.turn == chess.WHITE:
+        return negamax(board, depth, alpha, beta, deadline, ply)
+    return -negamax(board, depth, -beta, -alpha, deadline, ply)
+
+
+def _castling_ep_key(board):
+    """Castling and en passant terms of the polyglot key for ``board``."""
+    return _ZOBRIST.hash_castling(board) ^ _ZOBRIST.hash_ep_square(board)
+
+
+def _push_keyed(board, move, key):
+    """
+    Push ``move`` and return the new position's zobrist key, updated from the
+    parent's ``key`` by XORing out/in only the terms the move touches instead
+    of rehashing every piece. With ``key`` None this is a plain push.
+    """
+    if key is None:
+        board.push(move)
+        return None
+
+    key ^= _castling_ep_key(board)
+    if move:
+        us = board.turn
+        from_sq, to_sq = move.from_square, move.to_square
+        piece_type = board.piece_type_at(from_sq)
+        key ^= _ZOBRIST_PIECES[(piece_type - 1) * 2 + us][from_sq]
+        key ^= _ZOBRIST_PIECES[((move.promotion or piece_type) - 1) * 2 + us][to_sq]
+
+        if board.is_castling(move):
+            rank = chess.square_rank(from_sq)
+            if board.is_kingside_castling(move):
+                rook_from, rook_to = chess.square(7, rank), chess.square(5, rank)
+            else:
+                rook_from, rook_to = chess.square(0, rank), chess.square(3, rank)
+            rook = _ZOBRIST_PIECES[(chess.ROOK - 1) * 2 + us]
+            key ^= rook[rook_from] ^ rook[rook_to]
+        else:
+            victim_sq = to_sq
+            if board.is_en_passant(move):
+                victim_sq = to_sq - 8 if us == chess.WHITE else to_sq + 8
+            victim = board.piece_type_at(victim_sq)
+            if victim:
+                key ^= _ZOBRIST_PIECES[(victim - 1) * 2 + (not us)][victim_sq]
+
+    board.push(move)
+    return key ^ _ZOBRIST_TURN ^ _castling_ep_key(board)
+
+
+def _has_non_pawn_material(board):
+    """Whether the side to move has a knight, bishop, rook or queen."""
+    pieces = board.knights | board.bishops | board.rooks | board.queens
+    return bool(pieces & board.occupied_co[board.turn])
+
+
+def _age_move_ordering():
+    """Forget the killers and halve the history scores before a new search."""
+    for killers in _KILLERS:
+        killers[0] = killers[1] = None
+    for key, score in list(_HISTORY.items()):
+        if score > 1:
+            _HISTORY[key] = score // 2
+        else:
+            _HISTORY.pop(key, None)
 
-    if maximizing_white:
-        max_eval = -math.inf
-        for move in order_moves(board): 
-            board.push(move)
-            eval = minimax(board, depth - 1, alpha, beta, False)
-            board.pop()
-            max_eval = max(max_eval, eval)
-            alpha = max(alpha, eval)
-            if beta <= alpha:
-                break
-        return max_eval
-    else:
-        min_eval = math.inf
-        for move in order_moves(board):
-            board.push(move)
-            eval = minimax(board, depth - 1, alpha, beta, True)
-            board.pop()
-            min_eval = min(min_eval, eval)
-            beta = min(beta, eval)
-            if beta <= alpha:
-                break
-        return min_eval
 
+def _record_cutoff(board, move, depth, ply):
+    """Remember a quiet move that caused a beta cutoff (killers + history)."""
+    if move.promotion is not None or board.is_capture(move):
+        return
+    if ply < MAX_PLY:
+        killers = _KILLERS[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+    key = (board.piece_type_at(move.from_square), move.to_square)
+    _HISTORY[key] = _HISTORY.get(key, 0) + depth * depth
 
-def order_moves(board):
-    """Move ordering: promotions > captures > others"""
+
+def mvv_lva(board, move):
+    """
+    Most-valuable-victim / least-valuable-attacker key for a capture.
+    Piece type ints already run pawn < knight < bishop < rook < queen < king,
+    so any victim outranks every cheaper one regardless of the attacker.
+    """
+    victim = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+    attacker = board.piece_type_at(move.from_square)
+    return victim * 8 - attacker
+
+
+def order_moves(board, tt_move=None, ply=None):
+    """
+    Move ordering: TT best move > promotions > captures (MVV-LVA) > others.
+    Quiet moves are ranked by killers at ``ply`` first, then history score.
+    """
+    first = []
     promotions = []
     captures = []
     others = []
 
+    killers = _KILLERS[ply] if ply is not None and ply < MAX_PLY else ()
+
+    # Classify captures against the enemy bitboard once per node rather than
+    # through board.is_capture per move; en passant is the one capture onto
+    # an empty square.
+    enemy = board.occupied_co[not board.turn]
+    ep_square = board.ep_square if board.pawns & board.occupied_co[board.turn] else None
+    bb_squares = chess.BB_SQUARES
+
     for move in board.legal_moves:
-        if move.promotion is not None:
+        to_square = move.to_square
+        if move == tt_move:
+            first.append(move)
+        elif move.promotion is not None:
             promotions.append(move)
-        elif board.is_capture(move):
-            captures.append(move)
+        elif enemy & bb_squares[to_square] or (
+            to_square == ep_square and board.pawns & bb_squares[move.from_square]
+        ):
+            captures.append((mvv_lva(board, move), move))
         else:
-            others.append(move)
+            score = _HISTORY.get((board.piece_type_at(move.from_square), to_square), 0)
+            if move in killers:
+                score += 1_000_000
+            others.append((score, move))
+
+    captures.sort(key=lambda x: x[0], reverse=True)
+    others.sort(key=lambda x: x[0], reverse=True)
+
+    return first + promotions + [move for _, move in captures] + [move for _, move in others]
+
+
+def _search_order(board, tt_move, ply):
+    """
+    Yield moves for negamax: the TT move first, checked for legality on its
+    own, then the rest via order_moves. Move generation only happens if the
+    TT move fails to cut the node off.
+    """
+    if tt_move is not None and board.is_legal(tt_move):
+        yield tt_move
+    for move in order_moves(board, None, ply):
+        if move != tt_move:
+            yield move
+
+
+def _score_root_moves(board, depth, deadline=None, moves=None, alpha=-INF, beta=INF, workers=0):
+    """
+    Score every root move (or ``moves``, in that order) with a (depth - 1)
+    search inside the (alpha, beta) window, on up to ``workers`` processes.
+    Returns (mating_move, scored_moves); a mate in one short-circuits.
+    """
+    moves = list(board.legal_moves) if moves is None else moves
+
+    if workers > 1 and depth >= ROOT_SPLIT_MIN_DEPTH and len(moves) > 1:
+        pool = _root_pool(workers)
+        if pool is not None:
+            for move in moves:
+                board.push(move)
+                mate = board.is_checkmate()
+                board.pop()
+                if mate:
+                    return move, []
+            try:
+                scores = _score_moves_in_pool(pool, board, moves, depth, alpha, beta, deadline)
+            except BrokenProcessPool:
+                logger.warning("AI root split pool broke, searching serially", exc_info=True)
+                _shutdown_root_pool(disable=True)
+            else:
+                return None, list(zip(scores, moves))
+
+    scored_moves = []
+    for move in moves:
+        board.push(move)
+        if board.is_checkmate():
+            board.pop()
+            return move, scored_moves
+        score = minimax(board, depth - 1, alpha, beta, board.turn == chess.WHITE, deadline, 1)
+        board.pop()
+        scored_moves.append((score, move))
+    return None, scored_moves
+
+
+def _root_pool(workers):
+    """
+    Lazily start the shared root-split pool, sized by the first caller;
+    None when it would have fewer than two workers or is unavailable.
+    """
+    global _ROOT_POOL, _ROOT_POOL_DISABLED
+    workers = min(workers, ROOT_SPLIT_MAX_WORKERS, os.cpu_count() or 1)
+    if workers < 2:
+        return None
+    with _ROOT_POOL_LOCK:
+        if _ROOT_POOL is None and not _ROOT_POOL_DISABLED:
+            try:
+                # spawn, not fork: the web server forks from a threaded process
+                _ROOT_POOL = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except (OSError, NotImplementedError):
+                logger.warning("AI root split unavailable, searching serially", exc_info=True)
+                _ROOT_POOL_DISABLED = True
+        return _ROOT_POOL
+
+
+@atexit.register
+def _shutdown_root_pool(disable=False):
+    """Stop the root-split pool; with ``disable`` it is not started again."""
+    global _ROOT_POOL, _ROOT_POOL_DISABLED
+    with _ROOT_POOL_LOCK:
+        if disable:
+            _ROOT_POOL_DISABLED = True
+        if _ROOT_POOL is not None:
+            _ROOT_POOL.shutdown(wait=False, cancel_futures=True)
+            _ROOT_POOL = None
+
+
+def _score_moves_in_pool(pool, board, moves, depth, alpha, beta, deadline):
+    """Score ``moves`` on the pool; SearchTimeout from any worker cancels the rest."""
+    futures = [
+        pool.submit(_search_child, board, move, depth - 1, alpha, beta, deadline, _SEARCH_GENERATION)
+        for move in moves
+    ]
+    try:
+        return [future.result() for future in futures]
+    except SearchTimeout:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def _search_child(board, move, depth, alpha, beta, deadline, generation):
+    """
+    Worker entry point: score ``move`` from a pickled copy of the root,
+    first dropping this worker's cached state if the parent cleared its own.
+    """
+    global _SEARCH_GENERATION
+    if generation != _SEARCH_GENERATION:
+        clear_tt()
+        _SEARCH_GENERATION = generation
+    board.push(move)
+    return minimax(board, depth, alpha, beta, board.turn == chess.WHITE, deadline, 1)
+
+
+def _search_root(board, depth, deadline=None, previous=None, workers=0):
+    """
+    One iterative-deepening iteration. With the ``previous`` iteration's
+    scores (sorted best first) the root moves are searched in that order
+    inside an aspiration window around its best score, re-searching with the
+    window opened on one side when the new best lands outside it.
+    """
+    if not previous:
+        return _score_root_moves(board, depth, deadline, workers=workers)
+
+    moves = [move for _, move in previous]
+    if depth < ASPIRATION_MIN_DEPTH:
+        return _score_root_moves(board, depth, deadline, moves, workers=workers)
+
+    guess = previous[0][0]
+    alpha, beta = guess - ASPIRATION_WINDOW, guess + ASPIRATION_WINDOW
+
+    mating_move, scored_moves = _score_root_moves(board, depth, deadline, moves, alpha, beta, workers)
+    if mating_move is not None or not scored_moves:
+        return mating_move, scored_moves
 
-    return promotions + captures + others
+    scores = [score for score, _ in scored_moves]
+    best = max(scores) if board.turn == chess.WHITE else min(scores)
+    if alpha < best < beta:
+        # Moves outside the window only carry bounds, but they are all
+        # worse than the best move, so the ranking still holds.
+        return None, scored_moves
+
+    # Missed: the best score is only a bound, so re-search on the side it
+    # fell out of; the best score and any ties with it then come back exact.
+    logger.debug("AI aspiration window missed | depth=%s | guess=%s | best=%s", depth, guess, best)
+    if best <= alpha:
+        return _score_root_moves(board, depth, deadline, moves, -INF, alpha + 1, workers)
+    return _score_root_moves(board, depth, deadline, moves, beta - 1, INF, workers)
+
+
+def _rescore_root_moves(board, depth, moves, deadline=None, workers=0):
+    """
+    Full-window scores for ``moves`` (in that order), best first. If the
+    deadline passes first, the first move is returned alone.
+    """
+    ply = len(board.move_stack)
+    try:
+        mating_move, scored = _score_root_moves(board, depth, deadline, moves, workers=workers)
+    except SearchTimeout:
+        while len(board.move_stack) > ply:
+            board.pop()
+        logger.debug("AI fallback re-search timed out | depth=%s", depth)
+        return [(None, moves[0])]
+    if mating_move is not None:
+        return [(None, mating_move)]
+    scored.sort(key=lambda x: x[0], reverse=board.turn == chess.WHITE)
+    return scored
 
 
-def choose_ai_move(board, depth=3):
+def choose_ai_move(board, depth=3, time_budget=None, workers=0):
+    """
+    Pick a move for the side to move.
+
+    The search deepens iteratively from depth 1 up to ``depth``; each
+    iteration warms the transposition table and orders the root moves for
+    the next, which searches inside an aspiration window around the previous
+    best score. With ``time_budget`` (seconds) the last iteration completed
+    before the budget runs out decides. Depth 1 always completes so a move
+    is always available. ``workers`` > 1 splits the root moves of deeper
+    iterations across that many processes.
+    """
     logger.debug(
-        "AI evaluating position | turn=%s | depth=%s | fen=%s",
+        "AI evaluating position | turn=%s | depth=%s | budget=%s | fen=%s",
         "white" if board.turn else "black",
         depth,
+        time_budget,
         board.fen()
     )
 
@@ -159,15 +652,66 @@ def choose_ai_move(board, depth=3):
 
     maximizing_white = board.turn == chess.WHITE
 
-    for move in board.legal_moves:
-        board.push(move)
-        if board.is_checkmate():
-            board.pop()
-            return move
-        score = minimax(board, depth - 1, -math.inf, math.inf, board.turn == chess.WHITE)
-        board.pop()
-        scored_moves.append((score, move))
+    start = time.monotonic()
+    deadline = start + time_budget if time_budget else None
+    ply = len(board.move_stack)
 
+    # A finished search of this position to this depth is reused; only the
+    # final pick below (with its random tie-breaks) runs again
+    cache_key = (
+        chess.polyglot.zobrist_hash(board),
+        depth,
+        board.halfmove_clock,
+        board.is_repetition(2),
+    )
+    with _ROOT_CACHE_LOCK:
+        cached = _ROOT_CACHE.get(cache_key)
+        if cached is not None:
+            _ROOT_CACHE.move_to_end(cache_key)
+    if cached is not None:
+        scored_moves = list(cached)
+        logger.debug("AI root search cache hit | depth=%s", depth)
+
+    # Depth of the iteration that produced scored_moves
+    searched_depth = depth if cached is not None else 0
+
+    if cached is None:
+        _age_move_ordering()
+
+    depths = range(1, depth + 1) if cached is None else ()
+    for current_depth in depths:
+        try:
+            # The first iteration runs unbounded so there is always a result
+            mating_move, iteration = _search_root(
+                board, current_depth, deadline if scored_moves else None, scored_moves, workers
+            )
+        except SearchTimeout:
+            # Unwind the moves the aborted search left on the board
+            while len(board.move_stack) > ply:
+                board.pop()
+            logger.debug("AI search timed out | depth=%s", current_depth)
+            break
+
+        if mating_move is not None:
+            return mating_move
+        # Best first, so the next iteration searches the best move first
+        iteration.sort(key=lambda x: x[0], reverse=maximizing_white)
+        scored_moves = iteration
+        searched_depth = current_depth
+
+        logger.debug(
+            "AI search iteration complete | depth=%s | elapsed_ms=%.1f",
+            current_depth,
+            (time.monotonic() - start) * 1000
+        )
+        if current_depth == depth:
+            with _ROOT_CACHE_LOCK:
+                _ROOT_CACHE[cache_key] = list(scored_moves)
+                _ROOT_CACHE.move_to_end(cache_key)
+                while len(_ROOT_CACHE) > ROOT_CACHE_MAX_ENTRIES:
+                    _ROOT_CACHE.popitem(last=False)
+        if deadline is not None and time.monotonic() >= deadline:
+            break
 
     if not scored_moves:
         logger.error("AI failed to select a move | fen=%s", board.fen())
@@ -222,6 +766,7 @@ def choose_ai_move(board, depth=3):
         # If no safe moves in the tied group, search broader: find best non-hanging move
         # from all scored moves, not just the top 3
         if not safe_moves:
+            candidates = []
             for value, move in scored_moves:
                 board.push(move)
                 is_hanging = False
@@ -239,8 +784,15 @@ def choose_ai_move(board, depth=3):
                 board.pop()
                 
                 if not is_hanging:
-                    safe_moves.append((value, move))
-                    break  # Take the first (best) non-hanging move from full list
+                    candidates.append(move)
+
+            # Below the best move the root scores are only bounds (the
+            # aspiration window clamps them to its edge), so rank the
+            # candidates with a full-window search of the same depth
+            if candidates:
+                safe_moves = _rescore_root_moves(
+                    board, searched_depth, candidates, deadline, workers
+                )
         
         # Choose from safe moves; prefer random among equally-ranked, or best available
         if safe_moves:
@@ -268,14 +820,28 @@ def choose_ai_move(board, depth=3):
 
     return chosen_move
 
+def random_move(board):
+    """
+    Uniformly random legal move (or None) via reservoir sampling, so the
+    legal-move generator is never materialized into a list.
+    """
+    chosen = None
+    for i, move in enumerate(board.legal_moves):
+        if random.randrange(i + 1) == 0:
+            chosen = move
+    return chosen
+
 #material thing
 def material_score(board):
     """
     Returns material balance in centipawns.
     Positive = white ahead, negative = black ahead
     """
+    # Popcount the piece bitboards directly instead of building SquareSets
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
+    bitboards = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
     score = 0
-    for piece_type, value in PIECE_VALUES.items():
-        score += len(board.pieces(piece_type, chess.WHITE)) * value
-        score -= len(board.pieces(piece_type, chess.BLACK)) * value
+    for bb, value in zip(bitboards, _PIECE_VALUES[1:]):
+        score += (chess.popcount(bb & white) - chess.popcount(bb & black)) * value
     return score
\ No newline at end of file
@@ -1,16 +1,19 @@
 import os
 import logging
 from flask import Flask
+from cachelib import FileSystemCache
 from flask_session import Session
 from extensions import db
 from flask_migrate import Migrate
 from logging_config import setup_logging
+from json_provider import OrjsonProvider
 from game.routes import game_bp
 
 logger = logging.getLogger(__name__)
 
 def create_app(config_object=None):
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
 
     # -------------------------------------------------
     # Select configuration
@@ -53,6 +56,14 @@ def create_app(config_object=None):
     Migrate(app, db)
 
     app.secret_key = app.config["SECRET_KEY"]
+    # Built here, not in config.py, so importing config touches no disk.
+    # No file-count threshold: otherwise every session write reads a counter
+    # file and, past the limit, scans (and evicts from) the whole directory.
+    # Expired files are swept by scripts/cleanup_old_data.py instead.
+    if "SESSION_CACHELIB" not in app.config:
+        app.config["SESSION_CACHELIB"] = FileSystemCache(
+            app.config["SESSION_FILE_DIR"], threshold=0
+        )
     Session(app)
 
     # -------------------------------------------------
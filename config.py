@@ -1,5 +1,4 @@
 import os
-from cachelib import SimpleCache
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
@@ -9,16 +8,30 @@ class BaseConfig:
     SESSION_COOKIE_NAME = "chess_session"
 
     # 🗄️ Flask-Session (shared defaults)
-    SESSION_TYPE = 'filesystem'
+    # Session files under SESSION_FILE_DIR; create_app builds the
+    # FileSystemCache (SESSION_CACHELIB) from it unless a config sets one.
+    SESSION_TYPE = 'cachelib'
     SESSION_FILE_DIR = os.path.join(BASE_DIR, 'flask_session')
     SESSION_PERMANENT = False
     SESSION_USE_SIGNER = True
+    # Server-side store: the cookie only carries the signed sid, session data
+    # is written as raw msgpack bytes (no JSON/base64 round-trip)
+    SESSION_SERIALIZATION_FORMAT = 'msgpack'
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ENGINE_OPTIONS = {
         "pool_pre_ping": True
     }
 
+    # /stats/ai-record: server-side TTL and Cache-Control max-age (0 = off)
+    AI_RECORD_CACHE_SECONDS = 30
+
+    # /ai-move: iterative deepening up to AI_SEARCH_DEPTH within the time budget
+    AI_SEARCH_DEPTH = 1
+    AI_TIME_BUDGET_SECONDS = 1.0
+    # Processes to split root moves across from depth 3 (0 = serial search)
+    AI_ROOT_SPLIT_WORKERS = 0
+
 class DevelopmentConfig(BaseConfig):
     DEBUG = True
     TESTING = False # Enables testing mode
@@ -48,11 +61,17 @@ class TestingConfig(BaseConfig):
     }
     
     # 🗄️ Use filesystem sessions for tests that check session files
-    SESSION_TYPE = 'filesystem'
+    SESSION_TYPE = 'cachelib'
     SESSION_FILE_DIR = os.path.join(BASE_DIR, 'flask_session')
     SESSION_PERMANENT = True  # Make sessions persist in testing
     SESSION_USE_SIGNER = True
 
+    # Tests create/finish games directly in the DB and expect fresh stats
+    AI_RECORD_CACHE_SECONDS = 0
+
+    # Keep /ai-move fast and deterministic in depth for the suite
+    AI_SEARCH_DEPTH = 1
+
 class TestingConfigFilesystem(BaseConfig):
     """Testing config that uses filesystem sessions (for session file tests)"""
     DEBUG = False
@@ -73,11 +92,17 @@ class TestingConfigFilesystem(BaseConfig):
     }
     
     # 🗄️ Use filesystem sessions for tests that check session files
-    SESSION_TYPE = 'filesystem'
+    SESSION_TYPE = 'cachelib'
     SESSION_FILE_DIR = os.path.join(BASE_DIR, 'flask_session')
     SESSION_PERMANENT = True  # ← CHANGED: Must be True for E2E tests so sessions persist across reloads
     SESSION_USE_SIGNER = True
 
+    # Tests create/finish games directly in the DB and expect fresh stats
+    AI_RECORD_CACHE_SECONDS = 0
+
+    # Keep /ai-move fast and deterministic in depth for the suite
+    AI_SEARCH_DEPTH = 1
+
 class ProductionConfig(BaseConfig):
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
@@ -88,7 +113,7 @@ class ProductionConfig(BaseConfig):
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL")
 
     # Sessions — filesystem works fine on PA
-    SESSION_TYPE = "filesystem"
+    SESSION_TYPE = "cachelib"
     SESSION_PERMANENT = False
     SESSION_USE_SIGNER = True
 
@@ -1,14 +1,14 @@
+from itertools import islice
+import os
 import time
 from flask import Blueprint
 from flask import render_template, request, jsonify, session, current_app, g
 import chess
-import random
-from models import Game, db
+from models import Game, GameMove, db
 from datetime import datetime
 from game.services import GameService
-from ai import choose_ai_move, material_score, evaluate_board
-from helpers import explain_illegal_move, get_active_game_or_abort, get_ai_record, get_game_state, get_or_create_player_uuid, init_game, state_response
-import uuid
+from ai import choose_ai_move, material_score, evaluate_board, random_move
+from helpers import board_status, explain_illegal_move, get_active_game_or_abort, get_ai_record, get_current_game, get_game_state, get_or_create_player_uuid, init_game, is_terminal, state_response
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,18 +16,27 @@ logger = logging.getLogger(__name__)
 
 game_bp = Blueprint("game", __name__)
 
+# Minimum seconds between session["last_activity_ts"] refreshes
+ACTIVITY_DEBOUNCE_SECONDS = 30
+
 # -------------------------------------------------------------------
 # Routes
 # -------------------------------------------------------------------
 
 @game_bp.before_request
 def attach_request_context():
-    g.request_id = uuid.uuid4().hex[:8]
+    # 8 hex chars from os.urandom: a log tag, not an identifier. Not drawn
+    # from `random`, whose seeded state drives the AI's tie-breaks
+    g.request_id = os.urandom(4).hex()
     g.start_time = time.perf_counter()
 
+    # Only dirty the session (forcing a session-file rewrite) when the stored
+    # activity stamp is stale, not on every poll
     if request.endpoint != "static":
-        session["last_activity"] = datetime.utcnow().isoformat()
-        session.modified = True
+        now = time.time()
+        if now - session.get("last_activity_ts", 0) > ACTIVITY_DEBOUNCE_SECONDS:
+            session["last_activity_ts"] = now
+            session.modified = True
 
 @game_bp.after_request
 def log_request_completion(response):
@@ -63,12 +72,13 @@ def home():
     # Get current board state to pass to template
     board, move_history, captured_pieces, special_moves, _ = get_game_state()
     initial_position = board.fen()
+    board_state = board_status(board)
         
     status = ""
-    if board.is_checkmate():
+    if board_state["checkmate"]:
         winner = "White" if board.turn == chess.BLACK else "Black"
         status = f"{winner} wins by Checkmate!"
-    elif board.is_check():
+    elif board_state["check"]:
         status = "Check!"
     else:
         if board.turn == chess.WHITE:
@@ -82,7 +92,7 @@ def home():
         
     material = material_score(board)
     evaluation = evaluate_board(board)
-    game_over = board.is_checkmate() or board.is_stalemate() or board.is_insufficient_material() or board.is_fifty_moves() or board.is_seventyfive_moves() or board.is_fivefold_repetition()
+    game_over = board_state["game_over"] or board_state["fifty_moves"]
         
     return render_template("chess.html", 
                         initial_position=initial_position, 
@@ -93,19 +103,19 @@ def home():
                         initial_captured_pieces=captured_pieces,
                         initial_special_moves=special_moves,
                         initial_turn="white" if board.turn == chess.WHITE else "black",
-                        initial_check=board.is_check(),
-                        initial_checkmate=board.is_checkmate(),
-                        initial_stalemate=board.is_stalemate(),
-                        initial_fifty_moves=board.is_fifty_moves(),
-                        initial_can_claim_repetition=board.can_claim_threefold_repetition(),
-                        initial_insufficient_material=board.is_insufficient_material(),
+                        initial_check=board_state["check"],
+                        initial_checkmate=board_state["checkmate"],
+                        initial_stalemate=board_state["stalemate"],
+                        initial_fifty_moves=board_state["fifty_moves"],
+                        initial_can_claim_repetition=board_state["can_claim_repetition"],
+                        initial_insufficient_material=board_state["insufficient_material"],
                         ai_enabled=current_app.config.get('AI_ENABLED', False),
                         initial_game_over=game_over)
 
 
 @game_bp.route("/move", methods=["POST"])
 def move():
-    move_id = uuid.uuid4().hex[:8]
+    move_id = g.request_id
 
     board, move_history, captured_pieces, special_moves, _ = get_game_state()
     game, is_active = get_active_game_or_abort()
@@ -125,10 +135,12 @@ def move():
             code=400
         )
 
-    logger.debug("[%s] Session keys: %s", move_id, list(session.keys()))
-    logger.debug("[%s] Session FEN: %s", move_id, session.get("fen"))
-    logger.debug("[%s] Board FEN: %s", move_id, board.fen())
-    logger.debug("[%s] Turn: %s", move_id, "white" if board.turn else "black")
+    # Arguments below are built eagerly, so skip them entirely unless DEBUG
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[%s] Session keys: %s", move_id, list(session.keys()))
+        logger.debug("[%s] Session FEN: %s", move_id, session.get("fen"))
+        logger.debug("[%s] Board FEN: %s", move_id, board.fen())
+        logger.debug("[%s] Turn: %s", move_id, "white" if board.turn else "black")
 
     data = request.get_json()
     if data is None:
@@ -147,33 +159,38 @@ def move():
     to_sq = data.get("to")
     promotion = data.get("promotion")
 
-    # ✅ ADD THIS: Normalize promotion piece to lowercase (UCI standard)
-    if promotion:
-        promotion = promotion.lower()
-
-    uci = f"{from_sq}{to_sq}{promotion}" if promotion else f"{from_sq}{to_sq}"
-    logger.info("[%s] UCI move received: %s", move_id, uci)
-
     try:
-        move = chess.Move.from_uci(uci)
+        # Build the Move from its parts instead of formatting and re-parsing
+        # a UCI string. Bad squares/pieces raise ValueError like from_uci().
+        move = chess.Move(
+            chess.parse_square(from_sq),
+            chess.parse_square(to_sq),
+            promotion=chess.Piece.from_symbol(promotion).piece_type if promotion else None,
+        )
+        if move.from_square == move.to_square:
+            raise chess.InvalidMoveError(f"invalid move (same square): {from_sq}")
+
+        # Move.__str__ is its UCI form, so logging defers the formatting
+        logger.info("[%s] UCI move received: %s", move_id, move)
 
-        if move not in board.legal_moves:
+        if not board.is_legal(move):
             reason = explain_illegal_move(board, move)
                 
             # 🔧 ENHANCED LOGGING FOR ILLEGAL MOVES
             logger.warning(
                 "[%s] Illegal move | uci=%s | reason=%s | fen=%s",
                 move_id,
-                uci,
+                move,
                 reason,
                 board.fen(),
             )
 
-            logger.debug(
-                "[%s] Legal moves (sample): %s",
-                move_id,
-                [m.uci() for m in list(board.legal_moves)[:10]],
-            )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "[%s] Legal moves (sample): %s",
+                    move_id,
+                    [m.uci() for m in islice(board.legal_moves, 10)],
+                )
 
             return state_response(
                 status="illegal",
@@ -190,20 +207,14 @@ def move():
        
         # Clear test position flag if it was set (after first move)
         session.pop('_test_position_set', None)
-            
-        material = material_score(board)
-        evaluation = evaluate_board(board)
 
+        # material/evaluation come from build_full_state, computed once
         return state_response(
             status="ok",
             board=board,
             move_history=move_history,
             captured_pieces=captured_pieces,
             special_moves=special_moves,
-            extra={
-                "material": material,
-                "evaluation": evaluation,
-            }
         )
 
     except (chess.InvalidMoveError, ValueError) as e:
@@ -235,8 +246,7 @@ def move():
 @game_bp.route("/ai-move", methods=["POST"])
 def ai_move():
 
-    game_id = session.get("game_id")
-    game = db.session.get(Game, game_id) if game_id else None
+    game = get_current_game()
 
     board, move_history, captured_pieces, special_moves, _ = get_game_state()
 
@@ -244,7 +254,7 @@ def ai_move():
         return state_response(status="game_over", from_session=True, code=400)
 
     # Only move if game still active
-    if board.is_game_over():
+    if is_terminal(board):
         return state_response(
             status="ok",
             board=board,
@@ -256,14 +266,19 @@ def ai_move():
 
     logger.info("AI move requested | game_id=%s", session.get("game_id"))
     try:
-        ai_move = choose_ai_move(board, depth=1)
+        ai_move = choose_ai_move(
+            board,
+            depth=current_app.config.get("AI_SEARCH_DEPTH", 1),
+            time_budget=current_app.config.get("AI_TIME_BUDGET_SECONDS"),
+            workers=current_app.config.get("AI_ROOT_SPLIT_WORKERS", 0),
+        )
         if ai_move is None:
             logger.error("AI error, falling back to random move", exc_info=True)
-            ai_move = random.choice(list(board.legal_moves))
+            ai_move = random_move(board)
             logger.info("AI fallback move selected | uci=%s", ai_move.uci())
     except Exception as e:
         logger.error("AI selection failed, falling back to random move", exc_info=True)
-        ai_move = random.choice(list(board.legal_moves))
+        ai_move = random_move(board)
         logger.info("Fallback random move selected | uci=%s", ai_move.uci())
         
     # Execute the AI move
@@ -275,21 +290,15 @@ def ai_move():
         move_history=move_history,
         captured_pieces=captured_pieces,
         special_moves=special_moves,
-        extra={
-            "material": material_score(board),
-            "evaluation": evaluate_board(board),
-        }
     )
 
 # reset route
 @game_bp.route("/reset", methods=["POST"])
 def reset():
-    game_id = session.get("game_id")
-    logger.info("Game reset requested | game_id=%s", game_id)
-    if game_id:
-        game = db.session.get(Game, game_id)
-        if game and game.ended_at is None:
-            GameService.abandon_game()
+    logger.info("Game reset requested | game_id=%s", session.get("game_id"))
+
+    # Finalize in its own short transaction before the new game is created
+    GameService.abandon_game()
 
     session.clear()  # This also clears _test_position_set flag
     logger.debug("Session cleared and new game initialized")
@@ -317,7 +326,7 @@ def resign():
             code=400
         )
 
-    game = db.session.get(Game, game_id)
+    game = get_current_game()
     if not game or game.ended_at:
         logger.warning("Resign attempt on ended game | game_id=%s", game_id)
         return state_response(
@@ -458,7 +467,36 @@ def draw_agreement():
 ##### route to get AI record ######
 @game_bp.route("/stats/ai-record")
 def ai_record():
-    return get_ai_record()
+    max_age = current_app.config.get("AI_RECORD_CACHE_SECONDS", 0)
+    response = jsonify(get_ai_record())
+    if max_age > 0:
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    else:
+        response.headers["Cache-Control"] = "no-store"
+    return response
+
+def _history_rows(game_id, move_history):
+    """Build game_moves rows for a SAN history replayed from the start position"""
+    replay = chess.Board()
+    rows = []
+    for number, san in enumerate(move_history, start=1):
+        color = "white" if replay.turn == chess.WHITE else "black"
+        try:
+            move = replay.push_san(san)
+        except (ValueError, TypeError, AttributeError):
+            # Not SAN for this position, or not a string at all
+            logger.debug("[TEST] move_history does not replay from start | san=%s", san)
+            return []
+        rows.append({
+            "game_id": game_id,
+            "move_number": number,
+            "color": color,
+            "san": san,
+            "uci": move.uci(),
+            "fen_after": replay.fen(),
+        })
+    return rows
+
 
 ###### route for testing purposes only ######
 @game_bp.route("/test/set_position", methods=["POST"])
@@ -487,20 +525,17 @@ def test_set_position():
         logger.warning("Test set_position: FEN not provided")
         return jsonify({"error": "FEN required"}), 400
         
-    # Validate FEN
+    # Parse (and thereby validate) the FEN once. Using the provided FEN
+    # directly preserves castling and en-passant information exactly as the
+    # test supplied it, which is more reliable than attempting to set
+    # castling rights manually via bitboards.
     try:
-        test_board = chess.Board(fen)
+        board = chess.Board(fen)
         logger.debug("[TEST] Setting board position | fen=%s", fen)
     except ValueError as e:
         logger.error("[TEST] Invalid FEN provided | fen=%s | error=%s", fen, str(e))
         return jsonify({"error": f"Invalid FEN: {str(e)}"}), 400
         
-    # Use the provided FEN directly to preserve castling and en-passant
-    # information exactly as the test supplied it. Creating a board from
-    # the canonical FEN is more reliable than attempting to set
-    # castling rights manually via bitboards.
-    board = chess.Board(fen)
-        
     # Set session state
     # Store the exact FEN supplied by tests so session reflects the
     # intended position (including castling rights and ep square).
@@ -516,19 +551,20 @@ def test_set_position():
     # otherwise default to assigning to white (keeps prior behavior).
     sm_by_color = {'white': [], 'black': []}
     for item in provided_special:
-        if isinstance(item, str) and item.lower().startswith('white:'):
-            sm_by_color['white'].append(item.split(':', 1)[1].strip())
-        elif isinstance(item, str) and item.lower().startswith('black:'):
-            sm_by_color['black'].append(item.split(':', 1)[1].strip())
+        # Single split per item, then one dict lookup for the color prefix
+        prefix, sep, label = item.partition(':') if isinstance(item, str) else ('', '', '')
+        color = prefix.lower() if sep else None
+        if color in sm_by_color:
+            sm_by_color[color].append(label.strip())
         else:
             sm_by_color['white'].append(item)
 
     session['special_moves_by_color'] = sm_by_color
     session['_test_position_set'] = True
+    g.pop("game_state", None)
         
     # Create/update game for this test position
-    game_id = session.get("game_id")
-    game = db.session.get(Game, game_id) if game_id else None
+    game = get_current_game()
         
     if not game or game.ended_at:
         # Create new game for this test position
@@ -539,9 +575,17 @@ def test_set_position():
             last_activity_at=datetime.utcnow(),
         )
         db.session.add(new_game)
+        db.session.flush()
+
+        # Log the supplied history in one bulk INSERT when it replays
+        # cleanly from the starting position
+        rows = _history_rows(new_game.id, session['move_history'])
+        if rows:
+            db.session.execute(GameMove.__table__.insert(), rows)
+
         db.session.commit()
         session['game_id'] = new_game.id
-        logger.debug("[TEST] Created new test game | game_id=%s", new_game.id)
+        logger.debug("[TEST] Created new test game | game_id=%s | logged_moves=%s", new_game.id, len(rows))
     else:
         logger.debug("[TEST] Reusing existing test game | game_id=%s", game.id)
         
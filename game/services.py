@@ -6,10 +6,12 @@ from helpers import (
     save_game_state,
     finalize_game,
     finalize_game_if_over,
+    get_current_game,
+    invalidate_ai_record,
     touch_game,
     log_game_action,
 )
-from datetime import datetime
+from datetime import datetime, timezone
 
 import logging
 logger = logging.getLogger(__name__)
@@ -19,8 +21,7 @@ class GameService:
 
     @staticmethod
     def get_game():
-        game_id = session.get("game_id")
-        return db.session.get(Game, game_id) if game_id else None
+        return get_current_game()
 
     # -------------------------
     # PLAYER MOVE
@@ -51,8 +52,11 @@ class GameService:
                 fen_after=board.fen()
             ))
 
-            finalize_game_if_over(board, game)
-            if game.ended_at:
+            finalize_game_if_over(board, game, commit=False)
+            # Read before commit: commit expires the row, and checking
+            # ended_at afterwards would cost a SELECT to reload it.
+            ended = game.ended_at is not None
+            if ended:
                 logger.info(
                     "event=game_ended game_id=%s result=%s reason=%s",
                     game.id,
@@ -61,6 +65,8 @@ class GameService:
                 )
             touch_game(game)
             db.session.commit()
+            if ended:
+                invalidate_ai_record()
 
         save_game_state(board, move_history, captured_pieces, special_moves)
 
@@ -91,8 +97,9 @@ class GameService:
                 fen_after=board.fen()
             ))
 
-            finalize_game_if_over(board, game)
-            if game.ended_at:
+            finalize_game_if_over(board, game, commit=False)
+            ended = game.ended_at is not None
+            if ended:
                 logger.info(
                     "event=game_ended game_id=%s result=%s reason=%s",
                     game.id,
@@ -101,6 +108,8 @@ class GameService:
                 )
             touch_game(game)
             db.session.commit()
+            if ended:
+                invalidate_ai_record()
 
         save_game_state(board, move_history, captured_pieces, special_moves)
 
@@ -117,8 +126,8 @@ class GameService:
         winner = "black" if resigning_color == "white" else "white"
         result = "1-0" if winner == "white" else "0-1"
 
-        log_game_action(game, board, "[Resignation]")
-        finalize_game(game, result, "resignation")
+        log_game_action(game, board, "[Resignation]", commit=False)
+        finalize_game(game, result, "resignation", commit=False)
         touch_game(game)
 
         logger.info(
@@ -129,6 +138,7 @@ class GameService:
         )
 
         db.session.commit()
+        invalidate_ai_record()
 
         return result, winner
 
@@ -157,8 +167,8 @@ class GameService:
             readable = human_map.get(termination_reason, termination_reason)
             label = f"[Draw claimed: {readable}]"
 
-        log_game_action(game, board, label)
-        finalize_game(game, result, termination_reason)
+        log_game_action(game, board, label, commit=False)
+        finalize_game(game, result, termination_reason, commit=False)
         logger.info(
             "event=draw_claimed game_id=%s result=%s reason=%s",
             game.id,
@@ -167,6 +177,7 @@ class GameService:
         )
         touch_game(game)
         db.session.commit()
+        invalidate_ai_record()
 
         return {
             "result": result,
@@ -179,16 +190,31 @@ class GameService:
 
     @staticmethod
     def abandon_game():
-        game = GameService.get_game()
-        if game and game.ended_at is None:
-            finalize_game(game, "*", "abandoned")
-            game.state = "abandoned"
-            touch_game(game)
+        game_id = session.get("game_id")
+        if not game_id:
+            return
+
+        # Single conditional UPDATE: no prior SELECT, and a concurrent
+        # finalize simply matches zero rows instead of racing on the row.
+        now = datetime.now(timezone.utc)
+        updated = (
+            db.session.query(Game)
+            .filter_by(id=game_id, ended_at=None)
+            .update({
+                Game.result: "*",
+                Game.termination_reason: "abandoned",
+                Game.ended_at: now,
+                Game.state: "abandoned",
+                Game.last_activity_at: now,
+            })
+        )
+        db.session.commit()
+
+        if updated:
             logger.info(
                 "event=game_abandoned game_id=%s",
-                game.id
+                game_id
             )
-            db.session.commit()
 
     #-------------------------
     # game active check
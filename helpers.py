@@ -1,6 +1,10 @@
+from collections import OrderedDict
 from datetime import datetime, timezone
+import functools
+import threading
 import uuid
-from flask import jsonify, session
+from cachelib import SimpleCache
+from flask import current_app, g, jsonify, session
 from sqlalchemy import case, case, func
 from ai import evaluate_board, material_score
 from extensions import db
@@ -10,6 +14,17 @@ from models import Game, GameMove
 import logging
 
 logger = logging.getLogger(__name__)
+
+# Replayed move-history boards, keyed by SAN history (see _replay_history)
+REPLAY_CACHE_SIZE = 256
+_replay_cache = OrderedDict()
+_replay_lock = threading.Lock()
+_MISSING = object()
+
+# Process-local cache for the AI record aggregate (see AI_RECORD_CACHE_SECONDS)
+_ai_record_cache = SimpleCache(threshold=1)
+AI_RECORD_CACHE_KEY = "ai_record"
+
 # -------------------------------------------------------------------
 # Session Helpers
 # -------------------------------------------------------------------
@@ -44,7 +59,64 @@ def init_game():
     session["special_moves"] = []
     session["special_moves_by_color"] = {"white": [], "black": []}
     session.modified = True
+    g.pop("game_state", None)
+
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_board(fen):
+    """
+    Parse a FEN once and share the result across requests.
+    The returned board is shared — callers must ``.copy()`` it before use.
+    """
+    return chess.Board(fen)
+
+
+def _replay_history(move_history):
+    """
+    Rebuild a board from the starting position by replaying SAN history.
+
+    Every replay is kept in a small LRU keyed by the history, so the next
+    request (same history plus one move) copies the cached board and parses
+    only the new SAN instead of re-running legal-move generation for every
+    ply. Returns a fresh board, or None when the history doesn't replay.
+    """
+    key = tuple(move_history)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+
+    with _replay_lock:
+        cached = _replay_cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            _replay_cache.move_to_end(key)
+        else:
+            prefix = _replay_cache.get(key[:-1], _MISSING)
+
+    if cached is not _MISSING:
+        return cached.copy() if cached is not None else None
+
+    if prefix is _MISSING:
+        board, sans = chess.Board(), key
+    elif prefix is None:
+        board, sans = None, ()
+    else:
+        board, sans = prefix.copy(), key[-1:]
+
+    try:
+        for san in sans:
+            board.push_san(san)
+    except Exception as e:
+        logger.debug("Failed to rebuild board from move history | error=%s", e)
+        board = None
 
+    with _replay_lock:
+        _replay_cache[key] = board
+        if len(_replay_cache) > REPLAY_CACHE_SIZE:
+            _replay_cache.popitem(last=False)
+
+    return board.copy() if board is not None else None
 
 
 def get_game_state():
@@ -72,6 +144,12 @@ def get_game_state():
     below for examples where we assign to ``_`` to silence unused-variable
     warnings.
     """
+    # Already decoded earlier in this request (and kept current by
+    # save_game_state / init_game)
+    cached = g.get("game_state")
+    if cached is not None:
+        return cached
+
     if 'fen' not in session or session['fen'] is None:
         init_game()
 
@@ -82,29 +160,25 @@ def get_game_state():
     special_moves = session.get('special_moves', [])
     special_moves_by_color = session.get('special_moves_by_color', {'white': [], 'black': []})
 
-    # Try to create board from FEN, fallback to starting position if invalid
-    try:
-        board = chess.Board(session.get('fen', chess.STARTING_FEN))
-    except ValueError:
-        logger.warning("Invalid FEN in session, resetting board")
-        board = chess.Board()
+    # Rebuild from move history for position history (repetition detection);
+    # the FEN is only parsed when there is no replayable history
+    board = _replay_history(move_history) if move_history else None
 
-    # Try to rebuild from move history for position history (repetition detection)
-    if move_history:
+    # Try to create board from FEN, fallback to starting position if invalid
+    if board is None:
         try:
-            temp_board = chess.Board()
-            for san in move_history:
-                temp_board.push_san(san)
-            board = temp_board
-        except Exception as e:
-            logger.debug("Failed to rebuild board from move history | error=%s", e)
-            pass
+            board = _parse_board(session.get('fen', chess.STARTING_FEN)).copy()
+        except ValueError:
+            logger.warning("Invalid FEN in session, resetting board")
+            board = chess.Board()
 
-    return board, move_history, captured_pieces, special_moves, special_moves_by_color
+    g.game_state = (board, move_history, captured_pieces, special_moves, special_moves_by_color)
+    return g.game_state
 
 
 def save_game_state(board, move_history, captured_pieces, special_moves, special_moves_by_color=None):
-    session['fen'] = board.fen()
+    fen = board.fen()
+    session['fen'] = fen
     session['move_history'] = move_history
     session['captured_pieces'] = captured_pieces
     session['special_moves'] = special_moves
@@ -114,7 +188,15 @@ def save_game_state(board, move_history, captured_pieces, special_moves, special
         # this argument can remain optional.
         session['special_moves_by_color'] = special_moves_by_color
 
-    logger.debug("Game state saved | fen=%s", board.fen())
+    g.game_state = (
+        board,
+        move_history,
+        captured_pieces,
+        special_moves,
+        session.get('special_moves_by_color', {'white': [], 'black': []}),
+    )
+
+    logger.debug("Game state saved | fen=%s", fen)
     session.modified = True
 
 
@@ -168,8 +250,8 @@ def execute_move(board, move, move_history, captured_pieces, special_moves, is_a
 
     # For AI: Force promotion if pawn reaches last rank without promotion
     if is_ai and (
-        board.piece_at(move.from_square)
-        and board.piece_at(move.from_square).piece_type == chess.PAWN
+        moving_piece
+        and moving_piece.piece_type == chess.PAWN
         and chess.square_rank(move.to_square) in (0, 7)
         and move.promotion is None
     ):
@@ -384,7 +466,7 @@ def explain_illegal_move(board, move):
     return "That's not a legal move in this position."
 
 
-def finalize_game(game, result, reason):
+def finalize_game(game, result, reason, commit=True):
     if game.ended_at is not None:
         logger.debug("Game already finalized | game_id=%s", game.id)
         return
@@ -404,12 +486,16 @@ def finalize_game(game, result, reason):
     game.state = "finished"
     game.last_activity_at = now
 
-    db.session.commit()
+    # Callers passing commit=False invalidate the AI record after their commit
+    if commit:
+        db.session.commit()
+        invalidate_ai_record()
 
-def finalize_game_if_over(board, game):
+def finalize_game_if_over(board, game, commit=True):
     """
     Finalizes the game if the board is in a game-over state.
     Retrns True if the game was finalized, False otherwise.
+    Pass commit=False when the caller commits the surrounding transaction.
         """
 
     if board.is_checkmate():
@@ -437,7 +523,7 @@ def finalize_game_if_over(board, game):
     else:
         return False
 
-    finalize_game(game, result, reason)
+    finalize_game(game, result, reason, commit=commit)
 
     logger.info(
         "Game over detected | game_id=%s | reason=%s",
@@ -448,12 +534,25 @@ def finalize_game_if_over(board, game):
 
 
 # Active Game Retrieval
-def get_active_game_or_abort():
+def get_current_game():
+    """
+    Game row for the session's game_id, looked up at most once per request.
+    Keyed by game_id so init_game()/reset switching games refetches.
+    """
     game_id = session.get("game_id")
     if not game_id:
-        return None, None
+        return None
+
+    cached = g.get("game")
+    if cached is not None and cached[0] == game_id:
+        return cached[1]
 
     game = db.session.get(Game, game_id)
+    g.game = (game_id, game)
+    return game
+
+def get_active_game_or_abort():
+    game = get_current_game()
     if not game:
         return None, None
 
@@ -464,7 +563,7 @@ def get_active_game_or_abort():
 
 
 #log game actions resign and clams
-def log_game_action(game, board, label):
+def log_game_action(game, board, label, commit=True):
     last_move = (
         GameMove.query
         .filter_by(game_id=game.id)
@@ -482,7 +581,8 @@ def log_game_action(game, board, label):
         uci=None,
         fen_after=board.fen()
     ))
-    db.session.commit()
+    if commit:
+        db.session.commit()
 
     logger.info(
         "Game action logged | game_id=%s | action=%s",
@@ -498,13 +598,22 @@ def get_or_create_player_uuid():
     return session["player_uuid"]
 
 
-# update last move date/time
+# update last move date/time (committed by the caller with the rest of the move)
 def touch_game(game):
     game.last_activity_at = datetime.now(timezone.utc)
-    db.session.commit()
 
 # get the ai record against human players
 def get_ai_record():
+    """
+    Aggregate AI wins/losses/draws. Served from a process-local TTL cache
+    when AI_RECORD_CACHE_SECONDS is set; finalize_game() invalidates it.
+    """
+    ttl = current_app.config.get("AI_RECORD_CACHE_SECONDS", 0)
+    if ttl:
+        cached = _ai_record_cache.get(AI_RECORD_CACHE_KEY)
+        if cached is not None:
+            return cached
+
     rows = (
         db.session.query(
             func.sum(case((Game.result == "0-1", 1), else_=0)).label("wins"),
@@ -523,7 +632,7 @@ def get_ai_record():
     total = wins + losses + draws
     win_rate = round((wins / total) * 100, 1) if total else 0.0
 
-    return {
+    record = {
         "wins": wins,
         "losses": losses,
         "draws": draws,
@@ -531,23 +640,81 @@ def get_ai_record():
         "total": total
     }
 
-def build_full_state(board, move_history, captured_pieces, special_moves):
-    return {
-        "fen": board.fen(),
-        "turn": "white" if board.turn == chess.WHITE else "black",
-        "check": board.is_check(),
-        "checkmate": board.is_checkmate(),
-        "stalemate": board.is_stalemate(),
+    if ttl:
+        _ai_record_cache.set(AI_RECORD_CACHE_KEY, record, timeout=ttl)
+
+    return record
+
+
+def invalidate_ai_record():
+    _ai_record_cache.delete(AI_RECORD_CACHE_KEY)
+
+def is_terminal(board):
+    """
+    Same answer as ``board.is_game_over()`` (no claimable draws), ordered
+    cheapest first: material count and the 75-move clock are O(1), one
+    legal-move probe covers checkmate and stalemate, and the fivefold
+    repetition scan over the move stack runs last.
+    """
+    return (
+        board.is_insufficient_material()
+        or board.is_seventyfive_moves()
+        or not any(board.generate_legal_moves())
+        or board.is_fivefold_repetition()
+    )
+
+def board_status(board):
+    """
+    Game-state predicates for the current position, each computed once.
+
+    Legal-move generation and the repetition scans are the expensive part, so
+    checkmate/stalemate share a single legal-move probe. ``game_over`` matches
+    ``board.is_game_over()`` (no claimable draws).
+    """
+    check = board.is_check()
+    has_moves = any(board.generate_legal_moves())
+    status = {
+        "check": check,
+        "checkmate": check and not has_moves,
+        "stalemate": not check and not has_moves,
         "fifty_moves": board.is_fifty_moves(),
         "can_claim_repetition": board.can_claim_threefold_repetition(),
         "insufficient_material": board.is_insufficient_material(),
+        "seventyfive_moves": board.is_seventyfive_moves(),
+        "fivefold_repetition": board.is_fivefold_repetition(),
+    }
+    status["game_over"] = (
+        not has_moves
+        or status["insufficient_material"]
+        or status["seventyfive_moves"]
+        or status["fivefold_repetition"]
+    )
+    return status
+
+def build_full_state(board, move_history, captured_pieces, special_moves, status="ok"):
+    """
+    The one response dict every route returns, built in a single literal
+    (no post-hoc key writes) from predicates evaluated once.
+    """
+    predicates = board_status(board)
+    return {
+        "fen": board.fen(),
+        "turn": "white" if board.turn == chess.WHITE else "black",
+        "check": predicates["check"],
+        "checkmate": predicates["checkmate"],
+        "stalemate": predicates["stalemate"],
+        "fifty_moves": predicates["fifty_moves"],
+        "can_claim_repetition": predicates["can_claim_repetition"],
+        "insufficient_material": predicates["insufficient_material"],
         "move_history": move_history,
         "captured_pieces": captured_pieces,
         "special_moves": special_moves,
         "special_moves_by_color": session.get('special_moves_by_color', {'white': [], 'black': []}),
         "material": material_score(board),
         "evaluation": evaluate_board(board),
-        "game_over": board.is_game_over()
+        # Force game_over flag when appropriate
+        "game_over": predicates["game_over"] or status == "game_over",
+        "status": status,
     }
 
 # full state generic fucntion for all responses
@@ -577,15 +744,10 @@ def state_response(
         board,
         move_history,
         captured_pieces,
-        special_moves
+        special_moves,
+        status=status,
     )
 
-    state["status"] = status
-
-    # Force game_over flag when appropriate
-    if status == "game_over":
-        state["game_over"] = True
-
     if extra:
         state.update(extra)
 
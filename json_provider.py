@@ -0,0 +1,34 @@
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    Every route ends in ``state_response()`` -> ``jsonify()``, so swapping the
+    provider speeds up serialization everywhere without touching route code.
+    Responses are always compact and keys keep insertion order (no sort or
+    pretty-print pass, even in debug); datetimes are handed back to Flask's
+    ``default`` hook (HTTP date format).
+    """
+
+    sort_keys = False
+    compact = True
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(
+            obj,
+            default=kwargs.get("default", self.default),
+            option=option,
+        ).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
@@ -0,0 +1,58 @@
+"""add cleanup indexes
+
+Revision ID: 980ac07a648f
+Revises: e4090d486ca9
+Create Date: 2026-10-16 09:12:04.318562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '980ac07a648f'
+down_revision = 'e4090d486ca9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    insp = sa.inspect(conn)
+
+    # -------------------------------------------------
+    # 1) game: cleanup_games filters (state, ended_at, <age column>)
+    # -------------------------------------------------
+    existing_indexes = {idx["name"] for idx in insp.get_indexes("game")}
+
+    if "ix_game_state_ended_started" not in existing_indexes:
+        op.create_index(
+            "ix_game_state_ended_started",
+            "game",
+            ["state", "ended_at", "started_at"],
+        )
+
+    if "ix_game_state_ended_activity" not in existing_indexes:
+        op.create_index(
+            "ix_game_state_ended_activity",
+            "game",
+            ["state", "ended_at", "last_activity_at"],
+        )
+
+    # -------------------------------------------------
+    # 2) game_moves: EXISTS probe per game + "last move" lookups
+    # -------------------------------------------------
+    existing_indexes = {idx["name"] for idx in insp.get_indexes("game_moves")}
+
+    if "ix_game_moves_game_id_move_number" not in existing_indexes:
+        op.create_index(
+            "ix_game_moves_game_id_move_number",
+            "game_moves",
+            ["game_id", "move_number"],
+        )
+
+
+def downgrade():
+    op.drop_index("ix_game_moves_game_id_move_number", table_name="game_moves")
+    op.drop_index("ix_game_state_ended_activity", table_name="game")
+    op.drop_index("ix_game_state_ended_started", table_name="game")
@@ -22,6 +22,12 @@ class Game(db.Model):
     player_uuid = db.Column(db.String(36), nullable=False, index=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.Integer, nullable=True)
 
+    # scripts/cleanup_old_data.py filters
+    __table_args__ = (
+        db.Index("ix_game_state_ended_started", "state", "ended_at", "started_at"),
+        db.Index("ix_game_state_ended_activity", "state", "ended_at", "last_activity_at"),
+    )
+
 class GameMove(db.Model):
     __tablename__ = 'game_moves'
     id = db.Column(db.Integer, primary_key=True)
@@ -35,4 +41,8 @@ class GameMove(db.Model):
 
     fen_after = db.Column(db.Text)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_game_moves_game_id_move_number", "game_id", "move_number"),
+    )
\ No newline at end of file
@@ -392,7 +392,7 @@ $(document).ready(function () {
         if (state.game_over) {
             board.draggable = false;
             updateButtonVisibility('game_over');
-            loadAIRecord();
+            loadAIRecord(true);
         } else {
             // Enable dragging when game is active
             board.draggable = true;
@@ -404,12 +404,18 @@ $(document).ready(function () {
     // 5. SERVER / GAME ACTIONS
     // =====================================================
 
-    function loadAIRecord() {
-        $.get("/stats/ai-record", function (data) {
-            $("#ai-wins").text(data.wins);
-            $("#ai-losses").text(data.losses);
-            $("#ai-draws").text(data.draws);
-            $("#ai-winrate").text(`${data.win_rate}%`);
+    function loadAIRecord(bypassCache = false) {
+        // The endpoint is cacheable; bypass the browser cache right after a
+        // game ends so the new result shows up immediately.
+        $.ajax({
+            url: "/stats/ai-record",
+            cache: !bypassCache,
+            success: function (data) {
+                $("#ai-wins").text(data.wins);
+                $("#ai-losses").text(data.losses);
+                $("#ai-draws").text(data.draws);
+                $("#ai-winrate").text(`${data.win_rate}%`);
+            }
         });
     }
 
@@ -2,22 +2,35 @@
 Pytest configuration and shared fixtures.
 """
 
+import logging
+import os
+import random
 import threading
-import time
 from pathlib import Path
 
 import pytest
-from sqlalchemy import inspect
-from flask_migrate import upgrade
 
-from app import create_app
-from config import TestingConfig
-from extensions import db
-from models import Game, GameMove
+logger = logging.getLogger(__name__)
+
+# Resolved once here rather than probed by seed_rng on every test
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
+
+# App, DB and server imports live inside the fixtures that need them, so
+# plain collection (e.g. --collect-only, -k subsets) doesn't pay for them.
 
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
+    from flask_migrate import upgrade
+    from sqlalchemy import inspect
+
+    from app import create_app
+    from config import TestingConfig
+    from extensions import db
+
     app = create_app(TestingConfig)
 
     with app.app_context():
@@ -42,6 +55,9 @@ def e2e_session_dir(tmp_path_factory):
 
 @pytest.fixture(scope="session")
 def flask_server(e2e_session_dir):
+    from werkzeug.serving import make_server
+
+    from app import create_app
     from config import TestingConfigFilesystem
 
     class E2ETestingConfig(TestingConfigFilesystem):
@@ -52,60 +68,82 @@ def flask_server(e2e_session_dir):
     flask_app.config["AI_ENABLED"] = True
     flask_app.config["DEBUG"] = False
 
-    port = 5000
+    # One server per pytest-xdist worker (gw0 -> 5000, gw1 -> 5001, ...)
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    port = 5000 + int(worker[2:] or 0)
     base_url = f"http://localhost:{port}"
 
-    def run_server():
-        flask_app.run(port=port, use_reloader=False, threaded=True)
-
-    thread = threading.Thread(target=run_server, daemon=True)
+    # make_server binds and listens before returning, so the port accepts
+    # connections (queued in the backlog) before serve_forever even starts.
+    server = make_server("127.0.0.1", port, flask_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
     thread.start()
 
-    for _ in range(10):
-        try:
-            import urllib.request
+    yield base_url
 
-            urllib.request.urlopen(base_url, timeout=1)
-            break
-        except Exception:
-            time.sleep(0.5)
+    server.shutdown()
+    thread.join(timeout=2)
 
-    yield base_url
+
+@pytest.fixture
+def live_server(flask_server):
+    """
+    Base URL for E2E tests
+    Uses flask_server fixture to auto-start Flask
+    """
+    return flask_server
+
+
+@pytest.fixture(scope="session")
+def cleanup_engine(e2e_session_dir):
+    """
+    One app, entered once, whose engine serves every per-test cleanup.
+
+    Tests only need the pooled engine, so the per-test path pushes no app
+    context and builds no ORM session.
+    """
+
+    from app import create_app
+    from config import TestingConfigFilesystem
+    from extensions import db
+
+    class CleanupConfig(TestingConfigFilesystem):
+        SESSION_FILE_DIR = str(e2e_session_dir)
+
+    app = create_app(CleanupConfig)
+    with app.app_context():
+        engine = db.engine
+
+    yield engine
+
+    engine.dispose()
 
 
 @pytest.fixture(autouse=True)
-def cleanup_flask_session(e2e_session_dir):
+def cleanup_flask_session(request, e2e_session_dir, cleanup_engine):
     """
     Clean Flask-Session files and game DB records before each test.
     """
-    session_dir = Path(e2e_session_dir)
-
-    if session_dir.exists():
-        for session_file in session_dir.glob("*"):
-            if session_file.is_file():
-                try:
-                    session_file.unlink()
-                    print(f"[CLEANUP] Removed session file: {session_file.name}")
-                except Exception as e:
-                    print(f"[CLEANUP] Failed to remove {session_file.name}: {e}")
+    # Only the live E2E server writes into e2e_session_dir; every other test
+    # would just pay for an empty directory scan.
+    if "flask_server" in request.fixturenames:
+        try:
+            with os.scandir(e2e_session_dir) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        try:
+                            os.unlink(entry.path)
+                        except OSError as e:
+                            print(f"[CLEANUP] Failed to remove {entry.name}: {e}")
+        except FileNotFoundError:
+            pass
+
+    from models import Game, GameMove
 
     try:
-        from config import TestingConfigFilesystem
-        from extensions import db
-        from models import Game, GameMove
-
-        class CleanupConfig(TestingConfigFilesystem):
-            SESSION_FILE_DIR = str(e2e_session_dir)
-
-        app = create_app(CleanupConfig)
-        with app.app_context():
-            GameMove.query.delete()
-            Game.query.delete()
-            db.session.commit()
-            print("[CLEANUP] Cleared database Game records")
-
-            db.engine.dispose()
-            print("[CLEANUP] Disposed database engine connections")
+        with cleanup_engine.begin() as conn:
+            conn.execute(GameMove.__table__.delete())
+            conn.execute(Game.__table__.delete())
     except Exception as e:
         print(f"[CLEANUP] Warning: Failed to clear database: {e}")
 
@@ -115,17 +153,11 @@ def cleanup_flask_session(e2e_session_dir):
 @pytest.fixture(autouse=True)
 def seed_rng():
     """Set deterministic RNG before each test."""
-    import random
-
     seed = 42
     random.seed(seed)
 
-    try:
-        import numpy as np
-
-        np.random.seed(seed)
-    except ImportError:
-        pass
+    if _np is not None:
+        _np.random.seed(seed)
 
     yield
 
@@ -136,6 +168,6 @@ def clear_page_cookies(request):
     if "page" in request.fixturenames:
         page = request.getfixturevalue("page")
         page.context.clear_cookies()
-        print(f"[FIXTURE] Cleared cookies before test: {request.node.name}")
+        logger.debug("[FIXTURE] Cleared cookies before test: %s", request.node.name)
 
     yield
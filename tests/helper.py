@@ -1,21 +1,35 @@
+import os
 import re
 
-from flask import json
 from playwright.sync_api import Page, expect, TimeoutError as PlaywrightTimeoutError
 from urllib.parse import urlparse
 
+# Set CHESS_TEST_DEBUG=1 to echo setup traffic; failures still carry the
+# full server result in their assertion messages.
+_DEBUG = bool(os.environ.get("CHESS_TEST_DEBUG"))
+
 
 def wait_for_board_ready(page: Page, timeout: int = 10000):
-    """Wait until the chessboard container is visible, sized, and squares are rendered."""
+    """
+    Wait until the chessboard container is visible, sized, and squares are
+    rendered, and chessboard-init has published ``window.board``.
+
+    The first successful check is remembered on ``window`` (so it resets on
+    navigation); later calls on the same document resolve on the first poll.
+    """
     expect(page.locator("#board")).to_be_visible(timeout=timeout)
     page.wait_for_function(
         """
         () => {
+            if (window.__BOARD_READY__) return true;
+            if (!window.board || typeof window.board.position !== 'function') return false;
             const board = document.getElementById('board');
             if (!board) return false;
             const rect = board.getBoundingClientRect();
             if (rect.width <= 0 || rect.height <= 0) return false;
-            return board.querySelectorAll('[data-square]').length >= 64;
+            if (board.querySelectorAll('[data-square]').length < 64) return false;
+            window.__BOARD_READY__ = true;
+            return true;
         }
         """,
         timeout=timeout,
@@ -32,28 +46,6 @@ def _matches_post_path(resp, expected_path: str) -> bool:
     return parsed_path == target_path
 
 
-def _wait_for_animation_idle(page: Page, timeout: int = 10000):
-    """
-    Wait for chessboard.js temporary animation pieces to clear from <body>.
-
-    During board.position() animations, transient piece images are appended to
-    body, and dragging in that window is flaky.
-    """
-    page.wait_for_function(
-        """
-        () => {
-            const bodyPieces = Array.from(document.querySelectorAll("body > img[data-piece]"));
-            const visibleBodyPieces = bodyPieces.filter((img) => {
-                const style = window.getComputedStyle(img);
-                return style.display !== "none" && style.visibility !== "hidden";
-            });
-            return visibleBodyPieces.length === 0;
-        }
-        """,
-        timeout=timeout,
-    )
-
-
 def _wait_for_human_move_ready(page: Page, from_square: str, timeout: int = 10000):
     """Wait until UI indicates the human side can make a stable drag/drop move."""
     page.wait_for_function(
@@ -90,169 +82,168 @@ def assert_turn(page: Page, color: str, timeout: int = 10000):
     expect(page.locator("#game-status")).to_have_text(re.compile(expected), timeout=timeout)
 
 
-def setup_board_position(
-    page: Page,
-    fen: str,
-    move_history=None,
-    captured_pieces=None,
-    special_moves=None,
-    live_server: str = "http://localhost:5000",
-):
-    """
-    Set exact board/session state via /test/set_position and synchronize UI state.
-    """
-    wait_for_board_ready(page)
-
-    payload = {
-        "fen": fen,
-        "move_history": move_history or [],
-        "captured_pieces": captured_pieces or {"white": [], "black": []},
-        "special_moves": special_moves or [],
+# Applies a /test/set_position result to the page; the state is passed as an
+# argument so the script text is identical (and cached) across calls.
+_APPLY_SETUP_STATE_JS = """
+(state) => {
+    // Patch in place: chessboard-init.js holds a reference to this object
+    window.CHESS_CONFIG = window.CHESS_CONFIG || {};
+    Object.assign(window.CHESS_CONFIG, state, {
+        special_moves_by_color: state.special_moves_by_color || { white: [], black: [] },
+        termination_reason: state.termination_reason ?? null,
+    });
+
+    // Fail loudly rather than leave the rendered board on the old position
+    if (!window.board || typeof window.board.position !== 'function') {
+        throw new Error('window.board is not ready');
     }
+    window.board.position(state.fen, false);
 
-    result = page.evaluate(
-        f"""
-        async () => {{
-            const response = await fetch('/test/set_position', {{
-                method: 'POST',
-                headers: {{'Content-Type': 'application/json'}},
-                credentials: 'include',
-                body: JSON.stringify({json.dumps(payload)})
-            }});
-            return await response.json();
-        }}
-        """
-    )
-
-    print(f"[SETUP] /test/set_position returned: {result}")
-    assert result.get("status") == "ok", f"Failed to set position: {result}"
-
-    print("[SETUP] Updating page state from /test/set_position result")
-    update_script = f"""
-    window.CHESS_CONFIG = window.CHESS_CONFIG || {{}};
-    window.CHESS_CONFIG.fen = {json.dumps(result['fen'])};
-    window.CHESS_CONFIG.move_history = {json.dumps(result['move_history'])};
-    window.CHESS_CONFIG.captured_pieces = {json.dumps(result['captured_pieces'])};
-    window.CHESS_CONFIG.special_moves = {json.dumps(result['special_moves'])};
-    window.CHESS_CONFIG.special_moves_by_color = {json.dumps(result.get('special_moves_by_color', {'white': [], 'black': []}))};
-    window.CHESS_CONFIG.material = {result['material']};
-    window.CHESS_CONFIG.evaluation = {result['evaluation']};
-    window.CHESS_CONFIG.turn = {json.dumps(result['turn'])};
-    window.CHESS_CONFIG.check = {json.dumps(result['check'])};
-    window.CHESS_CONFIG.checkmate = {json.dumps(result['checkmate'])};
-    window.CHESS_CONFIG.stalemate = {json.dumps(result['stalemate'])};
-    window.CHESS_CONFIG.game_over = {json.dumps(result['game_over'])};
-    window.CHESS_CONFIG.fifty_moves = {json.dumps(result['fifty_moves'])};
-    window.CHESS_CONFIG.can_claim_repetition = {json.dumps(result['can_claim_repetition'])};
-    window.CHESS_CONFIG.insufficient_material = {json.dumps(result['insufficient_material'])};
-    window.CHESS_CONFIG.termination_reason = {json.dumps(result.get('termination_reason'))};
-
-    if (window.board) {{
-        board.position({json.dumps(result['fen'])}, false);
-    }}
-
-    if (typeof updateMaterialAdvantage === 'function') {{
+    if (typeof updateMaterialAdvantage === 'function') {
         updateMaterialAdvantage(window.CHESS_CONFIG.material);
-    }}
-    if (typeof updatePositionEvaluation === 'function') {{
+    }
+    if (typeof updatePositionEvaluation === 'function') {
         updatePositionEvaluation(window.CHESS_CONFIG.evaluation);
-    }}
-    if (typeof updateMoveHistory === 'function') {{
+    }
+    if (typeof updateMoveHistory === 'function') {
         updateMoveHistory(window.CHESS_CONFIG.move_history);
-    }} else {{
+    } else {
         const tbody = document.querySelector('#move-history tbody');
-        if (tbody) {{
+        if (tbody) {
             tbody.innerHTML = '';
             const history = window.CHESS_CONFIG.move_history || [];
-            for (let i = 0; i < history.length; i += 2) {{
+            for (let i = 0; i < history.length; i += 2) {
                 const moveNumber = Math.floor(i / 2) + 1;
                 const whiteMove = history[i] || '';
                 const blackMove = history[i + 1] || '';
                 const row = document.createElement('tr');
-                row.innerHTML = `<td>${{moveNumber}}</td><td>${{whiteMove}}</td><td>${{blackMove}}</td>`;
+                row.innerHTML = `<td>${moveNumber}</td><td>${whiteMove}</td><td>${blackMove}</td>`;
                 tbody.appendChild(row);
-            }}
-        }}
-    }}
-    if (typeof updateCaptured === 'function') {{
+            }
+        }
+    }
+    if (typeof updateCaptured === 'function') {
         updateCaptured(window.CHESS_CONFIG.captured_pieces);
-    }} else {{
-        const renderCapturedFallback = (selector, pieces, colorPrefix) => {{
+    } else {
+        const renderCapturedFallback = (selector, pieces, colorPrefix) => {
             const container = document.querySelector(selector);
             if (!container) return;
-            container.innerHTML = '';
-            (pieces || []).forEach(piece => {{
+            // Build the markup once and swap it in with a single DOM write
+            container.innerHTML = (pieces || []).map(piece => {
                 const code = (typeof piece === 'string' && piece.length === 1)
                     ? colorPrefix + piece.toUpperCase()
                     : piece;
-                const img = document.createElement('img');
-                img.src = `/static/images/chesspieces/wikipedia/${{code}}.png`;
-                img.alt = code;
-                img.className = 'captured-piece';
-                container.appendChild(img);
-            }});
-        }};
+                return `<img src="/static/images/chesspieces/wikipedia/${code}.png" alt="${code}" class="captured-piece">`;
+            }).join('');
+        };
 
         renderCapturedFallback('#white-captured', window.CHESS_CONFIG.captured_pieces?.white, 'b');
         renderCapturedFallback('#black-captured', window.CHESS_CONFIG.captured_pieces?.black, 'w');
-    }}
-    if (typeof updateSpecialMove === 'function') {{
+    }
+    if (typeof updateSpecialMove === 'function') {
         updateSpecialMove(window.CHESS_CONFIG.special_moves_by_color || window.CHESS_CONFIG.special_moves);
-    }}
+    }
 
     const statusElement = document.getElementById('game-status');
-    if (statusElement) {{
+    if (statusElement) {
         let finalStatus;
-        if (window.CHESS_CONFIG.game_over) {{
-            if (window.CHESS_CONFIG.checkmate) {{
+        if (window.CHESS_CONFIG.game_over) {
+            if (window.CHESS_CONFIG.checkmate) {
                 const winner = window.CHESS_CONFIG.turn === "white" ? "Black" : "White";
-                finalStatus = `${{winner}} wins - checkmate`;
-            }} else if (window.CHESS_CONFIG.stalemate) {{
+                finalStatus = `${winner} wins - checkmate`;
+            } else if (window.CHESS_CONFIG.stalemate) {
                 finalStatus = "Draw - stalemate";
-            }} else if (window.CHESS_CONFIG.insufficient_material) {{
+            } else if (window.CHESS_CONFIG.insufficient_material) {
                 finalStatus = "Draw - insufficient material";
-            }} else {{
+            } else {
                 finalStatus = "Game over";
-            }}
-        }} else if (window.CHESS_CONFIG.fifty_moves) {{
+            }
+        } else if (window.CHESS_CONFIG.fifty_moves) {
             finalStatus = "50-move rule available";
-        }} else if (window.CHESS_CONFIG.can_claim_repetition) {{
+        } else if (window.CHESS_CONFIG.can_claim_repetition) {
             finalStatus = "Threefold repetition available";
-        }} else {{
+        } else {
             finalStatus = window.CHESS_CONFIG.turn === "white" ? "White's turn" : "Black's turn";
-            if (window.CHESS_CONFIG.check) {{
+            if (window.CHESS_CONFIG.check) {
                 finalStatus += " - Check!";
-            }}
-        }}
+            }
+        }
         statusElement.textContent = finalStatus;
-    }}
+    }
+
+    return true;
+}
+"""
+
+
+# POSTs to /test/set_position and, on success, applies the returned state in
+# the same evaluate call.
+_SET_POSITION_JS = """
+async (payload) => {
+    const response = await fetch('/test/set_position', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        credentials: 'include',
+        body: JSON.stringify(payload)
+    });
+    const result = await response.json();
+    if (result.status !== 'ok') return { result };
+
+    try {
+        (%s)(result);
+    } catch (e) {
+        return { result, error: String(e) };
+    }
+    const statusElement = document.getElementById('game-status');
+    return { result, statusText: statusElement ? statusElement.textContent : '' };
+}
+""" % _APPLY_SETUP_STATE_JS.strip()
 
-    true;
+
+def setup_board_position(
+    page: Page,
+    fen: str,
+    move_history=None,
+    captured_pieces=None,
+    special_moves=None,
+    live_server: str = "http://localhost:5000",
+):
     """
+    Set exact board/session state via /test/set_position and synchronize UI state.
 
-    try:
-        result_confirm = page.evaluate(update_script)
-        print(f"[SETUP] Page state update successful (result: {result_confirm})")
-    except Exception as e:
-        print(f"[SETUP] ERROR: Could not execute state update script: {e}")
-        raise AssertionError(f"Failed to update page state: {e}")
+    No delay is needed after the POST: Flask-Session writes the session file
+    (and the browser receives Set-Cookie) before the response resolves.
+    """
+    wait_for_board_ready(page)
+
+    payload = {
+        "fen": fen,
+        "move_history": move_history or [],
+        "captured_pieces": captured_pieces or {"white": [], "black": []},
+        "special_moves": special_moves or [],
+    }
+
+    # One round trip: the in-page fetch and the UI sync run back to back
+    outcome = page.evaluate(_SET_POSITION_JS, payload)
+    result = outcome["result"]
+
+    if _DEBUG:
+        print(f"[SETUP] /test/set_position returned: {result}")
+    assert result.get("status") == "ok", f"Failed to set position: {result}"
 
+    if outcome.get("error"):
+        raise AssertionError(f"Failed to update page state: {outcome['error']}")
+    if _DEBUG:
+        print("[SETUP] Page state updated from /test/set_position result")
+
+    # The update ran synchronously in the evaluate above, so the server's fen
+    # (now in CHESS_CONFIG) and the rendered status can be checked here
+    # without polling the page again.
     expected_board = fen.split(" ")[0]
-    page.wait_for_function(
-        """
-        (expectedBoardFen) => {
-            const fen = window.CHESS_CONFIG?.fen;
-            if (!fen) return false;
-            return fen.split(' ')[0] === expectedBoardFen;
-        }
-        """,
-        arg=expected_board,
-        timeout=5000,
-    )
-    page.wait_for_function(
-        "() => { const el = document.getElementById('game-status'); return !!el && el.textContent.length > 0; }",
-        timeout=5000,
+    assert result["fen"].split(" ")[0] == expected_board, (
+        f"Server board {result['fen']!r} does not match requested {fen!r}"
     )
+    assert outcome.get("statusText"), "Game status was not rendered after setup"
 
 
 def get_piece_in_square(page: Page, square: str):
@@ -316,8 +307,9 @@ def send_move_and_wait_for_ai(
 
 def drag_move(page: Page, from_square: str, to_square: str, timeout: int = 10000):
     """Drag a piece and wait for the /move response."""
+    # Also covers animation idle: the predicate rejects visible body-level
+    # animation pieces, so no separate poll is needed before dragging.
     _wait_for_human_move_ready(page, from_square, timeout=timeout)
-    _wait_for_animation_idle(page, timeout=timeout)
 
     from_piece = get_piece_in_square(page, from_square)
     to_square_elem = page.locator(f'[data-square="{to_square}"]')
@@ -412,17 +404,28 @@ def _wait_for_ai_cycle_to_settle(page: Page, ai_result: dict, timeout: int = 150
 def drag_piece(page: Page, from_square: str, to_square: str, wait_ms: int = 3000):
     """
     Backward-compatible helper used by older tests.
+
+    Returns as soon as the /move response arrives; ``wait_ms`` only caps the
+    wait for drags that snap back without posting a move (returns None).
     """
     from_piece = get_piece_in_square(page, from_square)
     to_square_elem = page.locator(f'[data-square="{to_square}"]')
-    from_piece.first.drag_to(to_square_elem)
+    try:
+        with page.expect_response(
+            lambda resp: _matches_post_path(resp, "/move"),
+            timeout=wait_ms,
+        ) as move_response_info:
+            from_piece.first.drag_to(to_square_elem)
+    except PlaywrightTimeoutError:
+        return None
+    return move_response_info.value.json()
 
 
 def make_move(client, from_sq, to_sq, promotion=None):
     payload = {"from": from_sq, "to": to_sq}
     if promotion:
         payload["promotion"] = promotion
-    rv = client.post("/move", data=json.dumps(payload), content_type="application/json")
+    rv = client.post("/move", json=payload)
     return rv.get_json()
 
 
@@ -4,7 +4,18 @@ Advanced tests for AI move selection, evaluation, and search algorithms
 """
 import pytest
 import chess
-from ai import choose_ai_move, evaluate_board, minimax, quiescence, order_moves, material_score
+import chess.polyglot
+import ai
+from ai import SearchTimeout, choose_ai_move, clear_tt, evaluate_board, minimax, negamax, quiescence, order_moves, material_score, random_move
+
+
+@pytest.fixture
+def root_pool(monkeypatch):
+    """Allow a two-worker root-split pool on any machine; shut it down after the test"""
+    monkeypatch.setattr(ai.os, "cpu_count", lambda: 2)
+    monkeypatch.setattr(ai, "_ROOT_POOL_DISABLED", False)
+    yield
+    ai._shutdown_root_pool()
 
 
 class TestMoveOrdering:
@@ -57,6 +68,106 @@ class TestMoveOrdering:
         assert len(ordered) == len(legal)
         assert set(ordered) == set(legal)
 
+    @pytest.mark.unit
+    def test_order_moves_puts_tt_move_first(self):
+        """A transposition-table best move should be searched first"""
+        board = chess.Board("8/P7/8/8/8/8/8/K6k w - - 0 1")
+        tt_move = chess.Move.from_uci("a1b1")
+        ordered = order_moves(board, tt_move)
+
+        assert ordered[0] == tt_move
+        assert len(ordered) == len(list(board.legal_moves))
+
+    @pytest.mark.unit
+    def test_order_moves_captures_most_valuable_victim_first(self):
+        """Captures should be ordered by victim value, then cheapest attacker"""
+        # Knight on d4 can take the queen on c6 or the pawn on e6; pawn on b5 can take the queen
+        board = chess.Board("4k3/8/2q1p3/1P6/3N4/8/8/4K3 w - - 0 1")
+        captures = [m for m in order_moves(board) if board.is_capture(m)]
+
+        assert [m.uci() for m in captures] == ["b5c6", "d4c6", "d4e6"]
+
+    @pytest.mark.unit
+    def test_order_moves_treats_en_passant_as_capture(self):
+        """En passant lands on an empty square but should still be ordered as a capture"""
+        board = chess.Board("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+        ordered = order_moves(board)
+
+        assert ordered[0] == chess.Move.from_uci("e5d6")
+        assert all(not board.is_capture(m) for m in ordered[1:])
+
+    @pytest.mark.unit
+    def test_search_order_yields_tt_move_before_generating(self, monkeypatch):
+        """The TT move is tried before the rest of the moves are generated"""
+        board = chess.Board()
+        tt_move = chess.Move.from_uci("g1f3")
+
+        def fail(*args, **kwargs):
+            raise AssertionError("moves generated before the TT move was tried")
+
+        monkeypatch.setattr(ai, "order_moves", fail)
+        assert next(ai._search_order(board, tt_move, 0)) == tt_move
+
+        monkeypatch.undo()
+        moves = list(ai._search_order(board, tt_move, 0))
+        assert moves[0] == tt_move
+        assert sorted(moves, key=str) == sorted(board.legal_moves, key=str)
+
+    @pytest.mark.unit
+    def test_search_order_skips_illegal_tt_move(self):
+        """A stale TT move that is illegal here is never yielded"""
+        board = chess.Board()
+        moves = list(ai._search_order(board, chess.Move.from_uci("e1e2"), 0))
+        assert len(moves) == board.legal_moves.count()
+
+    @pytest.mark.unit
+    def test_order_moves_puts_killer_before_other_quiet_moves(self):
+        """A killer move at the given ply should lead the quiet moves"""
+        clear_tt()
+        board = chess.Board()
+        killer = chess.Move.from_uci("b1c3")
+        ai._KILLERS[2][0] = killer
+
+        assert order_moves(board, ply=2)[0] == killer
+        assert order_moves(board, ply=3)[0] != killer
+
+        clear_tt()
+        assert ai._KILLERS[2] == [None, None]
+
+    @pytest.mark.unit
+    def test_order_moves_ranks_quiet_moves_by_history(self):
+        """Quiet moves with a higher history score should be searched earlier"""
+        clear_tt()
+        board = chess.Board()
+        ai._HISTORY[(chess.PAWN, chess.E4)] = 10
+        ai._HISTORY[(chess.KNIGHT, chess.F3)] = 20
+
+        assert [m.uci() for m in order_moves(board)[:2]] == ["g1f3", "e2e4"]
+        clear_tt()
+
+    @pytest.mark.unit
+    def test_new_search_clears_killers_and_halves_history(self, monkeypatch):
+        """Ordering state from earlier searches fades instead of accumulating"""
+        clear_tt()
+        ai._KILLERS[2][0] = chess.Move.from_uci("b1c3")
+        ai._HISTORY[(chess.KNIGHT, chess.F3)] = 20
+        ai._HISTORY[(chess.PAWN, chess.E4)] = 1
+
+        seen = {}
+
+        def spy(board, depth, deadline=None, previous=None, workers=0):
+            seen.setdefault("killers", list(ai._KILLERS[2]))
+            seen.setdefault("history", dict(ai._HISTORY))
+            return None, [(0, move) for move in board.legal_moves]
+
+        monkeypatch.setattr(ai, "_search_root", spy)
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3")
+        choose_ai_move(board, depth=1)
+
+        assert seen["killers"] == [None, None]
+        assert seen["history"] == {(chess.KNIGHT, chess.F3): 10}
+        clear_tt()
+
 
 class TestAIMoveSelection:
     """Tests for AI move selection logic"""
@@ -161,6 +272,135 @@ class TestAIMoveSelection:
         assert move_d2 in board.legal_moves
 
 
+    @pytest.mark.unit
+    def test_ai_iterative_deepening_returns_legal_move_within_budget(self):
+        """A tiny time budget should still finish depth 1 and leave the board intact"""
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3")
+        fen_before = board.fen()
+        move = choose_ai_move(board, depth=4, time_budget=0.01)
+
+        assert move in board.legal_moves
+        assert board.fen() == fen_before
+
+    @pytest.mark.unit
+    def test_hanging_fallback_ranks_bound_scores_with_full_window(self, monkeypatch):
+        """When the best move hangs a rook, the fallback re-searches instead of trusting bounds"""
+        # Bishop b2 attacks the undefended rook on a1
+        board = chess.Board("4k3/8/8/8/8/8/1b6/R3K3 w - - 0 1")
+        hanging = chess.Move.from_uci("e1e2")
+        # As after a failed-low aspiration: only the best score is exact,
+        # the rest are clamped to the window edge in arbitrary order
+        clamped = [(100, move) for move in board.legal_moves if move != hanging]
+        monkeypatch.setattr(ai, "_search_root", lambda *args: (None, [(500, hanging)] + clamped))
+        clear_tt()
+
+        assert choose_ai_move(board, depth=2) == chess.Move.from_uci("a1a2")
+        clear_tt()
+
+    @pytest.mark.unit
+    def test_repeat_choose_ai_move_reuses_root_search(self, monkeypatch):
+        """A second request for the same position and depth skips the search"""
+        clear_tt()
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3")
+        choose_ai_move(board, depth=2)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("root search should come from the cache")
+
+        monkeypatch.setattr(ai, "_search_root", fail)
+        assert choose_ai_move(board, depth=2) in board.legal_moves
+
+        clear_tt()
+        with pytest.raises(AssertionError):
+            choose_ai_move(board, depth=2)
+
+    @pytest.mark.unit
+    def test_root_search_cache_separates_draw_status(self, monkeypatch):
+        """Same pieces but a repeated position or another halfmove clock is searched afresh"""
+        clear_tt()
+        fen = "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3"
+        # Same halfmove clock as after the knight shuffle below, but no history
+        choose_ai_move(chess.Board(fen.replace(" 3 3", " 7 5")), depth=2)
+
+        searched = []
+        real_search_root = ai._search_root
+
+        def spy(*args, **kwargs):
+            searched.append(True)
+            return real_search_root(*args, **kwargs)
+
+        monkeypatch.setattr(ai, "_search_root", spy)
+
+        repeated = chess.Board(fen)
+        for uci in ["g8f6", "f3g1", "f6g8", "g1f3"]:
+            repeated.push(chess.Move.from_uci(uci))
+        assert repeated.fen() == fen.replace(" 3 3", " 7 5")
+        choose_ai_move(repeated, depth=2)
+        assert searched
+
+        searched.clear()
+        choose_ai_move(chess.Board(fen.replace(" 3 3", " 40 3")), depth=2)
+        assert searched
+        clear_tt()
+
+    @pytest.mark.unit
+    def test_aspiration_miss_re_search_finds_same_best_score(self):
+        """A badly centred aspiration window should still yield the full-window best score"""
+        board = chess.Board("4k3/8/8/8/8/8/3PPP2/4K2R w - - 0 1")
+        clear_tt()
+        _, full = ai._score_root_moves(board, 3)
+        best = max(score for score, _ in full)
+
+        for guess in (best - 1000, best + 1000):
+            clear_tt()
+            previous = [(guess, move) for _, move in full]
+            _, scored = ai._search_root(board, 3, previous=previous)
+            assert max(score for score, _ in scored) == best
+
+    @pytest.mark.unit
+    def test_root_split_matches_serial_scores(self, root_pool):
+        """Scoring root moves on the process pool should match the serial search"""
+        board = chess.Board("4k3/8/8/8/8/8/3PPP2/4K2R w - - 0 1")
+        clear_tt()
+        _, serial = ai._score_root_moves(board, 3)
+        assert ai._ROOT_POOL is None
+
+        _, split = ai._score_root_moves(board, 3, workers=2)
+        assert ai._ROOT_POOL is not None
+        assert split == serial
+
+    @pytest.mark.unit
+    def test_broken_root_pool_is_not_restarted(self, root_pool):
+        """Once the pool has broken, later searches stay serial"""
+        board = chess.Board("4k3/8/8/8/8/8/3PPP2/4K2R w - - 0 1")
+        ai._shutdown_root_pool(disable=True)
+
+        _, scored = ai._score_root_moves(board, 3, workers=2)
+        assert ai._ROOT_POOL is None
+        assert len(scored) == board.legal_moves.count()
+
+    @pytest.mark.unit
+    def test_search_child_clears_stale_state_after_clear_tt(self):
+        """A worker still on an older search generation drops its TT first"""
+        board = chess.Board()
+        clear_tt()
+        generation = ai._SEARCH_GENERATION
+        ai._search_child(board.copy(), chess.Move.from_uci("e2e4"), 2, -ai.INF, ai.INF, None, generation)
+        assert len(ai._TT) > 0
+
+        ai._TT.store("stale", 9, 0, -ai.INF, ai.INF, None)
+        ai._search_child(board.copy(), chess.Move.from_uci("e2e4"), 1, -ai.INF, ai.INF, None, generation + 1)
+        assert ai._TT.get("stale") is None
+        assert ai._SEARCH_GENERATION == generation + 1
+        clear_tt()
+
+    @pytest.mark.unit
+    def test_minimax_raises_timeout_past_deadline(self):
+        """minimax should abort with SearchTimeout once the deadline has passed"""
+        board = chess.Board()
+        with pytest.raises(SearchTimeout):
+            minimax(board, 2, -float('inf'), float('inf'), True, deadline=0)
+
 class TestQuiescenceSearch:
     """Tests for quiescence search"""
     
@@ -209,6 +449,37 @@ class TestQuiescenceSearch:
         # Should return extreme score
         assert abs(score) > 50000
 
+    @pytest.mark.unit
+    def test_quiescence_black_to_move_takes_hanging_queen(self):
+        """With black to move, quiescence should credit black's capture"""
+        board = chess.Board("4k3/8/8/8/4p3/3Q4/8/4K3 b - - 0 1")
+
+        assert evaluate_board(board) > 0
+        assert quiescence(board, -float('inf'), float('inf')) < 0
+
+
+    @pytest.mark.unit
+    def test_quiescence_delta_prunes_hopeless_captures(self, monkeypatch):
+        """A pawn capture that cannot lift the score near alpha is not searched"""
+        # White to move can take the e5 pawn, but is a rook down
+        board = chess.Board("r3k3/8/8/4p3/3P4/8/8/4K3 w - - 0 1")
+        stand_pat = evaluate_board(board)
+        calls = []
+        original = ai._quiesce
+
+        def counting(*args, **kwargs):
+            calls.append(args)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(ai, "_quiesce", counting)
+
+        assert quiescence(board, stand_pat + 500, stand_pat + 600) == stand_pat + 500
+        assert len(calls) == 1
+
+        calls.clear()
+        quiescence(board, stand_pat - 100, stand_pat + 600)
+        assert len(calls) > 1
+
 
 class TestMinimaxAlgorithm:
     """Tests for minimax search algorithm"""
@@ -269,6 +540,60 @@ class TestMinimaxAlgorithm:
         # Should recognize checkmate
         assert abs(score) > 50000
     
+    @pytest.mark.unit
+    def test_minimax_repeat_search_reuses_transposition_table(self):
+        """A repeated search is answered from the TT with the same score"""
+        clear_tt()
+        board = chess.Board()
+
+        first = minimax(board, 2, -float('inf'), float('inf'), True)
+        assert len(ai._TT) > 0
+        assert minimax(board, 2, -float('inf'), float('inf'), True) == first
+
+        clear_tt()
+        assert len(ai._TT) == 0
+        assert minimax(board, 2, -float('inf'), float('inf'), True) == first
+
+    @pytest.mark.unit
+    def test_negamax_scores_from_side_to_move(self):
+        """negamax is minimax seen from the side to move"""
+        board = chess.Board()
+        board.push(chess.Move.from_uci("e2e4"))
+        clear_tt()
+        score = negamax(board, 2, -ai.INF, ai.INF)
+        clear_tt()
+
+        assert minimax(board, 2, -float('inf'), float('inf'), False) == -score
+
+    @pytest.mark.unit
+    def test_null_move_pruning_skipped_for_pawn_only_side(self):
+        """Null-move pruning is only tried when the side to move has pieces"""
+        board = chess.Board("4k3/3ppp2/8/8/8/8/3PPP2/4K2R w - - 0 1")
+        assert ai._has_non_pawn_material(board)
+        board.turn = chess.BLACK
+        assert not ai._has_non_pawn_material(board)
+
+    @pytest.mark.unit
+    def test_negamax_detects_mate_and_stalemate_without_game_over_probe(self):
+        """Terminal positions are recognised from the move loop alone"""
+        clear_tt()
+        mated = chess.Board("R5k1/5ppp/8/8/8/8/5PPP/7K b - - 0 1")
+        stalemated = chess.Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+        assert stalemated.is_stalemate()
+
+        assert negamax(mated, 2, -ai.INF, ai.INF) == -99999
+        assert negamax(stalemated, 2, -ai.INF, ai.INF) == 0
+        assert len(ai._TT) == 0
+
+    @pytest.mark.unit
+    def test_incremental_zobrist_key_matches_full_hash(self):
+        """Keys updated per move agree with rehashing, for special moves too"""
+        board = chess.Board("r3k2r/1P4pp/8/3pP3/8/8/6PP/R3K2R w KQkq d6 0 1")
+        key = chess.polyglot.zobrist_hash(board)
+        for uci in ["e5d6", "e8g8", "b7a8q", "0000", "e1c1"]:
+            key = ai._push_keyed(board, chess.Move.from_uci(uci), key)
+            assert key == chess.polyglot.zobrist_hash(board)
+
     @pytest.mark.unit
     def test_minimax_alpha_beta_pruning_works(self):
         """Alpha-beta pruning should reduce search space"""
@@ -341,6 +666,21 @@ class TestAIEdgeCases:
         assert move is not None
         assert move in board.legal_moves
 
+    @pytest.mark.unit
+    def test_random_move_returns_legal_move(self):
+        """Fallback sampler should only ever pick legal moves"""
+        board = chess.Board()
+
+        for _ in range(20):
+            assert random_move(board) in board.legal_moves
+
+    @pytest.mark.unit
+    def test_random_move_returns_none_without_legal_moves(self):
+        """Fallback sampler should return None when no move exists"""
+        board = chess.Board("7k/8/6Q1/8/8/8/8/K7 b - - 0 1")
+
+        assert random_move(board) is None
+
 
 class TestMaterialScoring:
     """Tests for material_score function"""
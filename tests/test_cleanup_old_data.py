@@ -0,0 +1,257 @@
+"""
+Tests for scripts/cleanup_old_data.py (the cron clean-up script).
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import create_app
+from config import TestingConfig
+from models import Game, GameMove, db
+from scripts import cleanup_old_data as cleanup
+
+
+@pytest.fixture(autouse=True)
+def reset_cleanup_state(monkeypatch):
+    """Each test starts with a zeroed byte counter and an empty lstat cache."""
+    monkeypatch.setattr(cleanup, "total_bytes_deleted", 0)
+    cleanup._lstat.cache_clear()
+    yield
+    cleanup._lstat.cache_clear()
+
+
+def _write(path, data=b"x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+@pytest.fixture
+def outside(tmp_path):
+    """A directory outside the swept tree, reachable only through symlinks."""
+    target = tmp_path / "outside"
+    _write(target / "outside.log")
+    _write(target / "__pycache__" / "mod.pyc")
+    _write(target / "~outside")
+    return target
+
+
+@pytest.fixture
+def tree(tmp_path, outside):
+    root = tmp_path / "root"
+
+    # Kept
+    _write(root / "keep.txt")
+    _write(root / "pkg" / "mod.py")
+    _write(root / "pkg" / "notes.md")
+
+    # Removed files
+    _write(root / "app.log", b"12345")
+    _write(root / "pkg" / "mod.pyc", b"123")
+    _write(root / "pkg" / "draft~")
+    _write(root / "pkg" / ".mod.py.swp")
+    _write(root / "~lockfile")
+
+    # Removed directories; the nested ones must not be visited on their own
+    _write(root / "pkg" / "__pycache__" / "mod.cpython-311.pyc", b"1234")
+    _write(root / "pkg" / "__pycache__" / "__pycache__" / "inner.pyc")
+    _write(root / ".cache" / "blob.bin")
+    _write(root / "~tempdir" / "keep_me_not.txt")
+
+    # Symlinked directories: neither followed by the walk nor by the rmtree
+    os.symlink(outside, root / "pkg" / "linked")
+    os.symlink(outside, root / "~linked")
+    os.symlink(outside, root / ".cache" / "escape")
+
+    return root
+
+
+def _sweep(root):
+    cleanup.sweep(
+        str(root),
+        dir_names=["__pycache__", ".cache", "~*"],
+        file_patterns=["*.log", "*.tmp", "~*", "*.bak", "*.pyc", "*.pyo", "*~", "*.swp", "*.swo"],
+    )
+
+
+def _relative_paths(root):
+    found = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            found.add(os.path.relpath(os.path.join(dirpath, name), root))
+    return found
+
+
+def _assert_outside_untouched(outside):
+    assert _relative_paths(outside) == {
+        "outside.log",
+        "__pycache__",
+        os.path.join("__pycache__", "mod.pyc"),
+        "~outside",
+    }
+
+
+def test_sweep_removes_exactly_the_matching_entries(tree, outside):
+    _sweep(tree)
+
+    assert _relative_paths(tree) == {
+        "keep.txt",
+        "pkg",
+        os.path.join("pkg", "mod.py"),
+        os.path.join("pkg", "notes.md"),
+        os.path.join("pkg", "linked"),
+    }
+    assert os.path.islink(tree / "pkg" / "linked")
+    _assert_outside_untouched(outside)
+
+
+def test_sweep_prunes_matched_directories(tree, monkeypatch):
+    removed = []
+    real_remove_trees = cleanup._remove_trees
+
+    def spy(paths, ignore_errors=False):
+        removed.extend(paths)
+        return real_remove_trees(paths, ignore_errors=ignore_errors)
+
+    monkeypatch.setattr(cleanup, "_remove_trees", spy)
+
+    _sweep(tree)
+
+    # The nested __pycache__ goes with its parent, never on its own
+    assert sorted(removed) == sorted([
+        str(tree / "pkg" / "__pycache__"),
+        str(tree / ".cache"),
+        str(tree / "~tempdir"),
+    ])
+
+
+def test_tilde_pattern_matches_files_and_directories(tree, outside):
+    cleanup.remove_files_starting_with_tilde(str(tree))
+
+    assert not os.path.lexists(tree / "~lockfile")
+    assert not os.path.lexists(tree / "~tempdir")
+    # A symlink to a directory is unlinked as an entry, not followed
+    assert not os.path.lexists(tree / "~linked")
+    assert (tree / "app.log").exists()
+    assert (tree / "pkg" / "__pycache__").is_dir()
+    _assert_outside_untouched(outside)
+
+
+def test_remove_path_without_rm_uses_fwalk(tree, outside, monkeypatch):
+    calls = []
+    real_fwalk_rmtree = cleanup._fwalk_rmtree
+
+    def spy(path):
+        calls.append(path)
+        return real_fwalk_rmtree(path)
+
+    monkeypatch.setattr(cleanup, "RM_BIN", None)
+    monkeypatch.setattr(cleanup, "_fwalk_rmtree", spy)
+
+    cleanup.remove_path(str(tree / ".cache"))
+
+    assert calls == [str(tree / ".cache")]
+    assert not os.path.lexists(tree / ".cache")
+    _assert_outside_untouched(outside)
+
+
+def test_remove_path_falls_back_to_shutil_rmtree(tree, outside, monkeypatch):
+    def failing_fwalk_rmtree(path):
+        raise OSError("fwalk unavailable")
+
+    monkeypatch.setattr(cleanup, "RM_BIN", None)
+    monkeypatch.setattr(cleanup, "_fwalk_rmtree", failing_fwalk_rmtree)
+
+    cleanup.remove_path(str(tree / ".cache"))
+
+    assert not os.path.lexists(tree / ".cache")
+    _assert_outside_untouched(outside)
+
+
+# -------------------------------------------------
+# cleanup_games
+# -------------------------------------------------
+
+@pytest.fixture(scope="module")
+def app():
+    # Built once per module; rows are reset per test by cleanup_flask_session.
+    return create_app(TestingConfig)
+
+
+@pytest.fixture
+def stale_games(app):
+    """One game per cleanup category plus a fresh one; returns their ids."""
+    long_ago = datetime.utcnow() - timedelta(hours=2)
+
+    with app.app_context():
+        empty = Game(state="active", started_at=long_ago, last_activity_at=long_ago)
+        zombie = Game(state="active", started_at=long_ago, last_activity_at=long_ago)
+        abandoned = Game(
+            state="abandoned",
+            started_at=long_ago,
+            last_activity_at=long_ago,
+            ended_at=long_ago,
+            termination_reason="abandoned",
+        )
+        fresh = Game(state="active")
+        db.session.add_all([empty, zombie, abandoned, fresh])
+        db.session.flush()
+
+        db.session.add(GameMove(
+            game_id=zombie.id,
+            move_number=1,
+            color="white",
+            san="e4",
+            uci="e2e4",
+            created_at=long_ago,
+        ))
+        db.session.commit()
+
+        return {
+            "empty": empty.id,
+            "zombie": zombie.id,
+            "abandoned": abandoned.id,
+            "fresh": fresh.id,
+        }
+
+
+def _surviving_ids(app):
+    with app.app_context():
+        return {game_id for (game_id,) in db.session.query(Game.id)}
+
+
+def test_cleanup_games_deletes_each_stale_category(app, stale_games):
+    with app.app_context():
+        deleted = cleanup.cleanup_games()
+
+    assert deleted == {"empty": 1, "zombie": 1, "abandoned": 1}
+    assert _surviving_ids(app) == {stale_games["fresh"]}
+    with app.app_context():
+        assert GameMove.query.filter_by(game_id=stale_games["zombie"]).count() == 0
+
+
+def test_cleanup_games_skips_game_touched_after_the_scan(app, stale_games, monkeypatch):
+    with app.app_context():
+        real_execute = db.session.execute
+        touched = []
+
+        def execute(statement, *args, **kwargs):
+            # The zombie game sees activity once the scan has tagged it
+            if getattr(statement, "is_delete", False) and not touched:
+                real_execute(
+                    update(Game)
+                    .where(Game.id == stale_games["zombie"])
+                    .values(last_activity_at=datetime.utcnow())
+                )
+                touched.append(stale_games["zombie"])
+            return real_execute(statement, *args, **kwargs)
+
+        monkeypatch.setattr(db.session, "execute", execute)
+        deleted = cleanup.cleanup_games()
+
+    assert touched
+    assert deleted == {"empty": 1, "zombie": 0, "abandoned": 1}
+    assert _surviving_ids(app) == {stale_games["zombie"], stale_games["fresh"]}
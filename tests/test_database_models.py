@@ -8,15 +8,17 @@ from config import TestingConfig
 from models import Game, GameMove, db
 from tests.test_routes_api import make_move, reset_board
 
-app = create_app(TestingConfig)
+@pytest.fixture(scope="module")
+def app():
+    # Built once per module; the schema is already migrated by setup_test_db
+    # and rows are reset per test by cleanup_flask_session.
+    return create_app(TestingConfig)
 
 @pytest.fixture
-def client():
+def client(app):
     app.config['TESTING'] = True
     app.config['AI_ENABLED'] = False
     with app.test_client() as client:
-        with app.app_context():
-            db.create_all()  # Ensure tables exist
         yield client
 
 def test_game_creation_on_init(client):
@@ -33,8 +35,9 @@ def test_game_creation_on_init(client):
         games_after = Game.query.count()
         assert games_after == games_before + 1
         
-        # Get the latest game
-        game = Game.query.order_by(Game.id.desc()).first()
+        # Look the new game up by the id init_game stored on the session
+        from flask import session
+        game = db.session.get(Game, session["game_id"])
         assert game.ai_enabled == True  # Default
         assert game.ended_at is None
 
@@ -57,7 +60,43 @@ def test_game_move_logging_player_move(client):
         assert move.uci == "e2e4"
         assert move.fen_after == rv["fen"]
 
-def test_game_move_logging_ai_move(client):
+def test_game_move_logging_does_not_reload_game_after_commit(app, client):
+    """Logging a move does not re-read the game row after the commit"""
+    import re
+
+    from sqlalchemy import event
+
+    reset_board(client)
+    make_move(client, "e2", "e4")
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def record_commit(conn):
+        statements.append("COMMIT")
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    event.listen(engine, "commit", record_commit)
+    try:
+        rv = make_move(client, "e7", "e5")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        event.remove(engine, "commit", record_commit)
+
+    assert rv["status"] == "ok"
+    assert "COMMIT" in statements
+    after_commit = statements[statements.index("COMMIT") + 1:]
+    game_table = re.compile(rf"\bFROM\s+`?{Game.__tablename__}`?(\s|$)", re.IGNORECASE)
+    assert not [
+        stmt for stmt in after_commit
+        if stmt.lstrip().upper().startswith("SELECT") and game_table.search(stmt)
+    ]
+
+def test_game_move_logging_ai_move(app, client):
     """AI moves are logged to database"""
     app.config['AI_ENABLED'] = True
     reset_board(client)
@@ -82,7 +121,7 @@ def test_game_move_logging_ai_move(client):
         assert player_move.color == "white"
         assert ai_move.color == "black"
 
-def test_game_finalization_on_checkmate(client):
+def test_game_finalization_on_checkmate(app, client):
     """Game is finalized when checkmate occurs"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -119,7 +158,7 @@ def test_game_finalization_on_resignation(client):
         assert game.result == "0-1"
         assert game.termination_reason == "resignation"
 
-def test_multiple_games_isolated(client):
+def test_multiple_games_isolated(app, client):
     """Multiple games don't interfere"""
     # Count games before test
     with app.app_context():
@@ -127,27 +166,28 @@ def test_multiple_games_isolated(client):
     
     reset_board(client)
     make_move(client, "e2", "e4")
+    with client.session_transaction() as sess:
+        game1_id = sess["game_id"]
     
     # New client session
     with app.test_client() as client2:
         reset_board(client2)
         make_move(client2, "d2", "d4")
+        with client2.session_transaction() as sess:
+            game2_id = sess["game_id"]
         
         with app.app_context():
             games_after = Game.query.count()
             assert games_after == games_before + 2
-            
-            # Get the last two games
-            games = Game.query.order_by(Game.id.desc()).limit(2).all()
-            game1, game2 = games
+            assert game1_id != game2_id
             
             # Each has one move
-            moves1 = GameMove.query.filter_by(game_id=game1.id).all()
-            moves2 = GameMove.query.filter_by(game_id=game2.id).all()
+            moves1 = GameMove.query.filter_by(game_id=game1_id).all()
+            moves2 = GameMove.query.filter_by(game_id=game2_id).all()
             assert len(moves1) == 1
             assert len(moves2) == 1
 
-def test_promotion_logged_correctly(client):
+def test_promotion_logged_correctly(app, client):
     """Promotion moves are logged with correct SAN"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -170,7 +210,7 @@ def test_promotion_logged_correctly(client):
         move = GameMove.query.filter_by(game_id=game_id, color="white").order_by(GameMove.move_number.desc()).first()
         assert "a8=Q" in move.san or move.san.endswith("=Q")
 
-def test_castling_logged_correctly(client):
+def test_castling_logged_correctly(app, client):
     """Castling moves are logged correctly"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -198,7 +238,7 @@ def test_castling_logged_correctly(client):
 # ADDITIONAL DATABASE TESTS - NEW
 # =============================================================================
 
-def test_game_move_fen_after_accuracy(client):
+def test_game_move_fen_after_accuracy(app, client):
     """GameMove.fen_after stores the correct board state"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -215,7 +255,7 @@ def test_game_move_fen_after_accuracy(client):
         assert move.fen_after == fen_after_first
 
 
-def test_game_last_activity_updates_on_move(client):
+def test_game_last_activity_updates_on_move(app, client):
     """Game.last_activity_at is updated on each move"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -255,7 +295,7 @@ def test_resignation_logged_with_marker(client):
         assert "[Resignation]" in move.san
 
 
-def test_draw_claim_logged_with_marker(client):
+def test_draw_claim_logged_with_marker(app, client):
     """50-move draw claim creates GameMove with marker"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -298,7 +338,7 @@ def test_game_state_transitions_from_active_to_finished(client):
         assert game.state == "finished"
 
 
-def test_cascade_delete_game_moves(client):
+def test_cascade_delete_game_moves(app, client):
     """Deleting a game cascades to delete GameMoves"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -326,7 +366,7 @@ def test_cascade_delete_game_moves(client):
         assert moves_after == 0
 
 
-def test_game_uuid_uniqueness(client):
+def test_game_uuid_uniqueness(app, client):
     """Each player gets a unique UUID"""
     reset_board(client)
     
@@ -397,7 +437,7 @@ def test_game_result_set_on_completion(client):
         assert game.result in ["1-0", "0-1", "1/2-1/2"]
 
 
-def test_move_number_increments(client):
+def test_move_number_increments(app, client):
     """GameMove.move_number increments correctly"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -416,7 +456,7 @@ def test_move_number_increments(client):
         assert moves[2].move_number == 3
 
 
-def test_game_move_color_alternates(client):
+def test_game_move_color_alternates(app, client):
     """GameMove.color alternates between white and black"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -434,7 +474,7 @@ def test_game_move_color_alternates(client):
         assert moves[2].color == "white"
 
 
-def test_capture_move_has_capture_flag(client):
+def test_capture_move_has_capture_flag(app, client):
     """Capture moves are correctly identified"""
     app.config['AI_ENABLED'] = False
     reset_board(client)
@@ -454,7 +494,7 @@ def test_capture_move_has_capture_flag(client):
         assert "x" in capture_move.san
 
 
-def test_game_with_ai_enabled_logged_correctly(client):
+def test_game_with_ai_enabled_logged_correctly(app, client):
     """ai_enabled flag is true for AI games"""
     app.config['AI_ENABLED'] = True
     reset_board(client)
@@ -26,15 +26,6 @@ from tests.helper import (
 # To see browser: pytest tests/test_e2e_playwright.py --headed
 
 
-@pytest.fixture
-def live_server(flask_server):
-    """
-    Base URL for E2E tests
-    Uses flask_server fixture from conftest.py to auto-start Flask
-    """
-    return flask_server
-
-
 interaction_test = pytest.mark.e2e_interaction
 state_test = pytest.mark.e2e_state
 
@@ -4,12 +4,16 @@ Tests for helper functions in helpers.py
 import pytest
 import chess
 from helpers import (
+    board_status,
     explain_illegal_move,
     finalize_game,
     finalize_game_if_over,
     get_active_game_or_abort,
+    get_game_state,
+    is_terminal,
     execute_move,
     save_game_state,
+    _replay_history,
 )
 from app import create_app
 from config import TestingConfig
@@ -390,3 +394,58 @@ def test_get_active_game_or_abort_returns_none_for_missing_game_record():
         game, is_active = get_active_game_or_abort()
         assert game is None
         assert is_active is None
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("fen", [
+    chess.STARTING_FEN,
+    "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3",  # checkmate
+    "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1",  # stalemate
+    "8/8/8/4k3/8/8/8/4K3 w - - 0 1",  # insufficient material
+    "4k3/8/8/8/8/8/8/R3K3 w - - 150 120",  # 75-move rule
+])
+def test_board_status_matches_board_predicates(fen):
+    board = chess.Board(fen)
+    status = board_status(board)
+
+    assert status["check"] == board.is_check()
+    assert status["checkmate"] == board.is_checkmate()
+    assert status["stalemate"] == board.is_stalemate()
+    assert status["fifty_moves"] == board.is_fifty_moves()
+    assert status["insufficient_material"] == board.is_insufficient_material()
+    assert status["game_over"] == board.is_game_over()
+    assert is_terminal(board) == board.is_game_over()
+
+
+@pytest.mark.unit
+def test_replay_history_extends_cached_prefix_and_returns_copies():
+    history = ["e4", "e5", "Nf3"]
+    first = _replay_history(history)
+    first.push_san("Nc6")
+
+    extended = _replay_history(history + ["Nc6"])
+    again = _replay_history(history)
+
+    assert extended.fen() == first.fen()
+    assert len(extended.move_stack) == 4
+    assert len(again.move_stack) == 3
+    assert _replay_history(["e4", "e4"]) is None
+    assert _replay_history(["e4", "e4", "e5"]) is None
+
+
+@pytest.mark.unit
+def test_get_game_state_decodes_session_once_per_request():
+    with app.test_request_context():
+        from flask import session
+        session["fen"] = chess.STARTING_FEN
+        session["move_history"] = ["e4"]
+
+        board, move_history, _, _, _ = get_game_state()
+        assert get_game_state()[0] is board
+
+        board.push_san("e5")
+        move_history.append("e5")
+        save_game_state(board, move_history, {"white": [], "black": []}, [])
+
+        assert get_game_state()[0] is board
+        assert session["fen"] == board.fen()
@@ -11,11 +11,6 @@ from tests.helper import (
 )
 
 
-@pytest.fixture
-def live_server(flask_server):
-    return flask_server
-
-
 def test_multiple_special_moves_accumulation_ui(page: Page, live_server):
     """
     Test that multiple special moves accumulate and display correctly.
@@ -1,5 +1,7 @@
 import pytest
+import logging
 import json
+import random
 import chess
 from app import create_app
 from config import TestingConfig
@@ -63,16 +65,21 @@ def test_ai_move_returns_game_over_when_position_is_terminal(client):
     assert rv["status"] == "ok"
     assert rv["game_over"] is True
 
-def test_ai_move_falls_back_to_random_when_choose_returns_none(client, monkeypatch):
+def test_ai_move_falls_back_to_random_when_choose_returns_none(client, monkeypatch, caplog):
     app.config['AI_ENABLED'] = False
     reset_board(client)
     make_move(client, "e2", "e4")  # set black to move
 
-    monkeypatch.setattr("game.routes.choose_ai_move", lambda board, depth=1: None)
-    rv = client.post("/ai-move").get_json()
+    monkeypatch.setattr("game.routes.choose_ai_move", lambda board, **kwargs: None)
+    with caplog.at_level(logging.ERROR, logger="game.routes"):
+        rv = client.post("/ai-move").get_json()
 
     assert rv["status"] == "ok"
     assert len(rv["move_history"]) == 2
+    # The None branch ran, not the exception fallback
+    messages = [r.getMessage() for r in caplog.records if r.name == "game.routes"]
+    assert "AI error, falling back to random move" in messages
+    assert "AI selection failed, falling back to random move" not in messages
 
 def test_ai_move_falls_back_to_random_when_choose_raises(client, monkeypatch):
     app.config['AI_ENABLED'] = False
@@ -94,6 +101,16 @@ def test_home(client, monkeypatch):
     rv = client.get("/")
     assert rv.status_code == 200
 
+def test_request_does_not_consume_global_random_state(client, monkeypatch):
+    # The seeded global RNG drives AI tie-breaks; tagging a request must not advance it
+    monkeypatch.setattr("game.routes.render_template", lambda x, **kwargs: "OK")
+    random.seed(42)
+    expected = random.random()
+
+    random.seed(42)
+    client.get("/")
+    assert random.random() == expected
+
 def test_reset(client):
     reset_board(client)
     # After reset, board should be at starting position
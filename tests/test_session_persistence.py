@@ -215,4 +215,21 @@ def test_session_modified_flag_set_correctly(client):
     
     with client.session_transaction() as sess:
         new_fen = sess.get('fen')
-        assert new_fen != initial_fen
\ No newline at end of file
+        assert new_fen != initial_fen
+
+def test_last_activity_stamp_is_debounced(client):
+    """Back-to-back requests reuse the stored activity stamp"""
+    client.get("/stats/ai-record")
+    with client.session_transaction() as sess:
+        first = sess["last_activity_ts"]
+
+    client.get("/stats/ai-record")
+    with client.session_transaction() as sess:
+        assert sess["last_activity_ts"] == first
+
+        # A stale stamp is refreshed on the next request
+        sess["last_activity_ts"] = first - 3600
+
+    client.get("/stats/ai-record")
+    with client.session_transaction() as sess:
+        assert sess["last_activity_ts"] > first - 3600
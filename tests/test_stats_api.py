@@ -3,6 +3,7 @@ from datetime import datetime
 
 from app import create_app
 from config import TestingConfig
+from helpers import finalize_game
 from models import Game, db
 
 
@@ -38,6 +39,7 @@ def test_ai_record_empty(client):
     rv = client.get("/stats/ai-record")
     data = rv.get_json()
 
+    assert rv.headers["Cache-Control"] == "no-store"
     assert data["wins"] == 0
     assert data["losses"] == 0
     assert data["draws"] == 0
@@ -66,3 +68,26 @@ def test_ai_record_counts_results(client):
     assert data["draws"] == 1
     assert data["total"] == 4
     assert data["win_rate"] == 50.0
+
+
+def test_ai_record_cache_invalidated_when_game_finalized(client):
+    app.config["AI_RECORD_CACHE_SECONDS"] = 30
+    try:
+        with app.app_context():
+            Game.query.delete()
+            db.session.commit()
+
+        rv = client.get("/stats/ai-record")
+        assert rv.headers["Cache-Control"] == "public, max-age=30"
+        assert rv.get_json()["total"] == 0
+
+        with app.app_context():
+            game = _create_game(None, ended=False)
+            db.session.commit()
+            finalize_game(game, "0-1", "checkmate")
+
+        data = client.get("/stats/ai-record").get_json()
+        assert data["wins"] == 1
+        assert data["total"] == 1
+    finally:
+        app.config["AI_RECORD_CACHE_SECONDS"] = 0
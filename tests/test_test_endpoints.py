@@ -134,3 +134,64 @@ def test_test_set_position_defaults_unprefixed_special_moves_to_white():
     assert data["status"] == "ok"
     assert data["special_moves_by_color"]["white"] == ["Castling", "Promotion to R"]
     assert data["special_moves_by_color"]["black"] == []
+
+
+def test_test_set_position_logs_replayable_move_history():
+    app = create_app(TestingConfig)
+    app.config["TESTING"] = True
+
+    with app.test_client() as client:
+        payload = {
+            "fen": "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2",
+            "move_history": ["e4", "e5"],
+        }
+        rv = client.post(
+            "/test/set_position",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+        with client.session_transaction() as sess:
+            game_id = sess.get("game_id")
+
+    assert rv.get_json()["status"] == "ok"
+
+    with app.app_context():
+        from models import GameMove
+
+        moves = (
+            GameMove.query.filter_by(game_id=game_id)
+            .order_by(GameMove.move_number)
+            .all()
+        )
+
+    assert [(m.move_number, m.color, m.san, m.uci) for m in moves] == [
+        (1, "white", "e4", "e2e4"),
+        (2, "black", "e5", "e7e5"),
+    ]
+    assert moves[-1].fen_after.split()[0] == payload["fen"].split()[0]
+
+
+def test_test_set_position_skips_logging_non_string_move_history():
+    app = create_app(TestingConfig)
+    app.config["TESTING"] = True
+
+    with app.test_client() as client:
+        payload = {
+            "fen": "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2",
+            "move_history": ["e4", 5, None],
+        }
+        rv = client.post(
+            "/test/set_position",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+        with client.session_transaction() as sess:
+            game_id = sess.get("game_id")
+
+    assert rv.status_code == 200
+    assert rv.get_json()["status"] == "ok"
+
+    with app.app_context():
+        from models import GameMove
+
+        assert GameMove.query.filter_by(game_id=game_id).count() == 0
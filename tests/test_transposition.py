@@ -0,0 +1,40 @@
+"""
+Tests for the AI transposition table in transposition.py
+"""
+import pytest
+
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+
+@pytest.mark.unit
+class TestTranspositionTable:
+    """Test bound classification and LRU eviction"""
+
+    def test_store_classifies_bounds_against_window(self):
+        tt = TranspositionTable()
+        tt.store(1, 2, -50, -10, 10, None)
+        tt.store(2, 2, 5, -10, 10, None)
+        tt.store(3, 2, 50, -10, 10, None)
+
+        assert tt.get(1)[2] == UPPER
+        assert tt.get(2)[2] == EXACT
+        assert tt.get(3)[2] == LOWER
+
+    def test_evicts_least_recently_used_entry(self):
+        tt = TranspositionTable(max_entries=2)
+        tt.store(1, 1, 0, -1, 1, None)
+        tt.store(2, 1, 0, -1, 1, None)
+        tt.get(1)  # 2 is now the oldest
+        tt.store(3, 1, 0, -1, 1, None)
+
+        assert len(tt) == 2
+        assert tt.get(2) is None
+        assert tt.get(1) is not None
+        assert tt.get(3) is not None
+
+    def test_clear_empties_table(self):
+        tt = TranspositionTable()
+        tt.store(1, 1, 0, -1, 1, None)
+        tt.clear()
+        assert len(tt) == 0
+        assert tt.get(1) is None
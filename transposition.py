@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+# Bound types for stored scores (Knuth/Moore classification)
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable:
+    """
+    Bounded LRU map: zobrist key -> (depth, value, flag, best_move).
+
+    Entries are keyed only by position, so they stay valid across requests
+    and games; the table is shared process-wide and simply evicts the least
+    recently used position once it is full.
+    """
+
+    def __init__(self, max_entries=200_000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                # Evicted by a concurrent search between get and move
+                pass
+        return entry
+
+    def store(self, key, depth, value, alpha, beta, best_move):
+        """Record a search result with its bound type relative to the window."""
+        if value <= alpha:
+            flag = UPPER
+        elif value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+
+        entries = self._entries
+        entries[key] = (depth, value, flag, best_move)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            try:
+                entries.popitem(last=False)
+            except KeyError:
+                break
+
+    def clear(self):
+        self._entries.clear()